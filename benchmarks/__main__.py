@@ -0,0 +1,3 @@
+from benchmarks.db_bench import main
+
+main()
@@ -0,0 +1,203 @@
+# benchmarks/db_bench.py
+"""
+Бенчмарк SQL-путей бота на одноразовом Postgres с мета-схемой NocoDB.
+
+    python -m benchmarks --users 100000 --bases 10000 --memberships 2000000 \
+        --output bench.json --compare previous.json
+
+Каждая операция меряется одним вызывающим и --concurrency параллельными.
+Результат сохраняется в JSON для сравнения между версиями.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+Operation = Callable[[], Awaitable[Any]]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк SQL-путей бота")
+    parser.add_argument("--dsn", help="Использовать существующий Postgres вместо одноразового")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--bases", type=int, default=10_000)
+    parser.add_argument("--memberships", type=int, default=2_000_000)
+    parser.add_argument("--iterations", type=int, default=500, help="Вызовов на операцию и режим")
+    parser.add_argument("--concurrency", type=int, default=20, help="Параллельных вызывающих")
+    parser.add_argument("--ops", default="", help="Операции через запятую (по умолчанию все)")
+    parser.add_argument("--output", default=None, help="Путь к JSON с результатами")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения p50/p99")
+    return parser.parse_args(argv)
+
+
+def _dsn_env(dsn: str) -> Dict[str, str]:
+    url = urlparse(dsn)
+    return {
+        "DB_HOST": url.hostname or "127.0.0.1",
+        "DB_PORT": str(url.port or 5432),
+        "DB_USER": unquote(url.username or "postgres"),
+        "DB_PASSWORD": unquote(url.password or ""),
+        "DB_NAME": url.path.lstrip("/") or "postgres",
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_operations(args: argparse.Namespace) -> Dict[str, Operation]:
+    """Операции бота над случайными пользователями и базами из заполненных данных."""
+    from bot.handlers.add import assign_user_to_base
+    from bot.handlers.delete_user import delete_user
+    from bot.handlers.find_user import get_user
+    from bot.handlers.whohave import get_user_bases
+    from bot.services.find_base_id import base_cache, get_base_id_by_all, search_bases
+    from bot.services.project_users import _fetch_sql as project_users_sql
+    from loadtest.schema import base_title, user_email
+
+    def email() -> str:
+        return user_email(random.randint(1, args.users))
+
+    def base() -> int:
+        return random.randint(1, args.bases)
+
+    async def resolve_base_uncached() -> Any:
+        base_cache.clear()
+        return await get_base_id_by_all(base_title(base()))
+
+    async def grant_revoke() -> Any:
+        # Пара выдача+отзыв держит размер таблицы постоянным между прогонами
+        n, address = base(), email()
+        await assign_user_to_base(f"p_{n}", address)
+        return await delete_user(address, base_title(n))
+
+    return {
+        "get_user": lambda: get_user(email()),
+        "get_user_bases": lambda: get_user_bases(email()),
+        "get_base_id_by_all": resolve_base_uncached,
+        "get_base_id_by_all_cached": lambda: get_base_id_by_all(base_title(random.randint(1, 100))),
+        # Опечатка в названии: «Магазн 123»
+        "search_bases": lambda: search_bases(base_title(base()).replace("Магазин", "Магазн")),
+        "project_users_sql": lambda: project_users_sql(f"p_{base()}"),
+        "assign_user_to_base": lambda: assign_user_to_base(f"p_{base()}", email()),
+        "delete_user": lambda: delete_user(email(), base_title(base())),
+        "grant_revoke": grant_revoke,
+    }
+
+
+async def measure(operation: Operation, iterations: int, concurrency: int) -> Dict[str, float]:
+    from loadtest.stats import summarize
+
+    latencies: List[float] = []
+    remaining = iterations
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**summarize(latencies), "ops_per_s": len(latencies) / elapsed if elapsed else 0.0}
+
+
+async def run(args: argparse.Namespace, db_env: Dict[str, str]) -> Dict[str, Any]:
+    os.environ.update(db_env)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("DB_SLOW_QUERY_MS", "1000000")
+    os.environ["DB_POOL_MAX_SIZE"] = str(max(args.concurrency, 10))
+
+    # Импорт после настройки окружения: config читается при импорте
+    from bot.services.db import close_pool, fetchval, get_connection, init_pool
+    from bot.services.find_base_id import ensure_search_index
+    from loadtest.schema import create_schema, seed
+
+    await init_pool()
+    try:
+        async with get_connection() as conn:
+            await create_schema(conn)
+            seed_started = time.perf_counter()
+            seeded = await seed(conn, args.users, args.bases, args.memberships)
+            seed_seconds = time.perf_counter() - seed_started
+            server_version = await fetchval(conn, "server_version", "SHOW server_version")
+        await ensure_search_index()
+        print(f"Заполнение: {'%.1f с' % seed_seconds if seeded else 'данные уже были'}")
+
+        operations = build_operations(args)
+        selected = [op.strip() for op in args.ops.split(",") if op.strip()] or list(operations)
+        results: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for name in selected:
+            operation = operations[name]
+            await measure(operation, min(50, args.iterations), 1)  # прогрев
+            results[name] = {
+                "single": await measure(operation, args.iterations, 1),
+                "concurrent": await measure(operation, args.iterations, args.concurrency),
+            }
+            print(
+                f"{name:<28} single p50 {results[name]['single']['p50_ms']:8.2f} мс  "
+                f"concurrent p99 {results[name]['concurrent']['p99_ms']:8.2f} мс  "
+                f"{results[name]['concurrent']['ops_per_s']:8.0f} оп/с"
+            )
+    finally:
+        await close_pool()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "postgres": server_version,
+        "scale": {"users": args.users, "bases": args.bases, "memberships": args.memberships},
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"\nСравнение с {previous.get('git_revision')} ({previous.get('timestamp')}):")
+    for name, modes in current["results"].items():
+        for mode, stats in modes.items():
+            old = previous.get("results", {}).get(name, {}).get(mode)
+            if not old:
+                continue
+            for key in ("p50_ms", "p99_ms"):
+                delta = (stats[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                print(f"{name:<28} {mode:<10} {key}: {old[key]:8.2f} -> {stats[key]:8.2f} мс ({delta:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.dsn:
+        report = asyncio.run(run(args, _dsn_env(args.dsn)))
+    else:
+        from benchmarks.postgres import EphemeralPostgres
+
+        with EphemeralPostgres() as postgres:
+            report = asyncio.run(run(args, postgres.env))
+
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
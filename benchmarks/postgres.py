@@ -0,0 +1,92 @@
+# benchmarks/postgres.py
+from __future__ import annotations
+
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from typing import Optional
+
+
+def _find_bindir() -> str:
+    """Ищет каталог с initdb/pg_ctl: PATH, pg_config, затем /usr/lib/postgresql/*/bin."""
+    initdb = shutil.which("initdb")
+    if initdb:
+        return os.path.dirname(initdb)
+    pg_config = shutil.which("pg_config")
+    if pg_config:
+        bindir = subprocess.run([pg_config, "--bindir"], capture_output=True, text=True).stdout.strip()
+        if os.path.exists(os.path.join(bindir, "initdb")):
+            return bindir
+    candidates = sorted(glob.glob("/usr/lib/postgresql/*/bin/initdb"))
+    if candidates:
+        return os.path.dirname(candidates[-1])
+    raise RuntimeError("Не найден initdb: установите PostgreSQL или передайте --dsn")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class EphemeralPostgres:
+    """
+    Одноразовый кластер Postgres во временном каталоге.
+
+    Запускается без fsync (данные не нужны после прогона) и удаляется в stop().
+    initdb не работает от root — в контейнере запускайте от обычного пользователя.
+    """
+
+    def __init__(self, bindir: Optional[str] = None):
+        self.bindir = bindir or _find_bindir()
+        self.datadir = tempfile.mkdtemp(prefix="secondbot-bench-")
+        self.port = _free_port()
+        self.user = "postgres"
+        self.database = "postgres"
+
+    def _bin(self, name: str) -> str:
+        return os.path.join(self.bindir, name)
+
+    def start(self) -> "EphemeralPostgres":
+        subprocess.run(
+            [self._bin("initdb"), "-D", self.datadir, "-U", self.user, "-A", "trust", "--no-sync"],
+            check=True, capture_output=True,
+        )
+        options = (
+            f"-p {self.port} -k {self.datadir} -c listen_addresses=127.0.0.1 "
+            f"-c fsync=off -c synchronous_commit=off -c full_page_writes=off "
+            f"-c shared_buffers=256MB -c max_connections=200"
+        )
+        subprocess.run(
+            [self._bin("pg_ctl"), "-D", self.datadir, "-o", options, "-l",
+             os.path.join(self.datadir, "postgres.log"), "-w", "start"],
+            check=True, capture_output=True,
+        )
+        return self
+
+    def stop(self) -> None:
+        subprocess.run(
+            [self._bin("pg_ctl"), "-D", self.datadir, "-m", "fast", "-w", "stop"],
+            capture_output=True,
+        )
+        shutil.rmtree(self.datadir, ignore_errors=True)
+
+    @property
+    def env(self) -> dict:
+        """Переменные окружения DB_* для конфигурации бота."""
+        return {
+            "DB_HOST": "127.0.0.1",
+            "DB_PORT": str(self.port),
+            "DB_USER": self.user,
+            "DB_NAME": self.database,
+            "DB_PASSWORD": "",
+        }
+
+    def __enter__(self) -> "EphemeralPostgres":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -1,15 +1,32 @@
 # bot/app.py
+import asyncio
+
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from aiogram.fsm.storage.memory import MemoryStorage
 from bot.handlers.start import router as start_router
-from config import API_TOKEN
+import config
+from config import API_TOKEN, NOCODB_BASE_URL, NOCODB_API_TOKEN
 from bot.handlers.find_user import router as find_router
 from bot.handlers.delete_user import router as delete_router
 from bot.handlers.whohave import router as who_router
 from bot.handlers.add import router as add_router
+from bot.handlers.bulk_add import router as bulk_add_router
+from bot.handlers.offboard import router as offboard_router
 from bot.handlers.button import router as admin_router
+from bot.services.db import init_pool, close_pool
+from bot.services.nocodb_client import NocodbClient
+from bot.services.storage import create_storage, create_events_isolation, fsm_session_counter
+from bot.services.metrics import start_metrics_server, track_cache, track_fsm_sessions
+from bot.services.loop_monitor import LoopMonitor
+from bot.services.admins import admin_registry
+from bot.services.find_base_id import base_cache, ensure_search_index
+from bot.middlewares.auth import AdminAuthMiddleware
+from bot.middlewares.throttling import ThrottlingMiddleware
+from bot.services.throttling import Throttler
+from bot.services.outbox import Outbox, RateLimiter
+from bot.middlewares.outbound import OutboundRateLimitMiddleware
+from bot.middlewares.metrics import UpdateMetricsMiddleware, setup_handler_metrics
 from logger_config import logger
 
 # Инициализация бота
@@ -17,10 +34,28 @@ bot = Bot(
     token=str(API_TOKEN),
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
+# Все исходящие вызовы идут через лимиты Telegram и переживают ответы 429
+bot.session.middleware(OutboundRateLimitMiddleware(
+    RateLimiter(
+        chat_rate=config.OUTBOUND_CHAT_RATE,
+        chat_burst=config.OUTBOUND_CHAT_BURST,
+        global_rate=config.OUTBOUND_GLOBAL_RATE,
+        global_burst=config.OUTBOUND_GLOBAL_BURST,
+    ),
+    max_retries=config.OUTBOUND_MAX_RETRIES,
+))
+# Уведомления без ожидания (отказы в доступе, лимиты) склеиваются по чатам
+outbox = Outbox(max_pending=config.OUTBOX_MAX_PENDING)
 
-# Используем MemoryStorage для хранения состояний
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
+# Хранилище состояний выбирается через FSM_STORAGE (memory или redis)
+storage = create_storage()
+# FSM-middleware подключается вручную ниже, после проверки прав
+dp = Dispatcher(
+    storage=storage,
+    events_isolation=create_events_isolation(storage),
+    disable_fsm=True,
+    outbox=outbox,
+)
 
 # Регистрация
 dp.include_router(start_router)
@@ -28,15 +63,123 @@ dp.include_router(find_router)
 dp.include_router(who_router)
 dp.include_router(delete_router)
 dp.include_router(add_router)
+dp.include_router(bulk_add_router)
+dp.include_router(offboard_router)
 dp.include_router(admin_router)
 
+# Метрики: апдейты целиком и время хендлеров каждого роутера
+dp.update.outer_middleware(UpdateMetricsMiddleware())
+# Апдейты не от администраторов отсекаются до чтения FSM и любых хендлеров
+dp.update.outer_middleware(AdminAuthMiddleware(admin_registry))
+dp.update.outer_middleware(dp.fsm)
+
+# Лимит частоты: стоимость хендлера задается флагом cost (записи дороже поиска)
+throttling = ThrottlingMiddleware(Throttler(
+    user_rate=config.THROTTLE_USER_RATE,
+    user_burst=config.THROTTLE_USER_BURST,
+    global_rate=config.THROTTLE_GLOBAL_RATE,
+    global_burst=config.THROTTLE_GLOBAL_BURST,
+))
+dp.message.middleware(throttling)
+dp.callback_query.middleware(throttling)
+for router in (start_router, find_router, who_router, delete_router, add_router,
+               bulk_add_router, offboard_router, admin_router):
+    setup_handler_metrics(router)
+
+
+# Следит за задержкой event loop и логирует блокирующие вызовы
+loop_monitor = LoopMonitor(
+    interval=config.LOOP_MONITOR_INTERVAL,
+    block_threshold=config.LOOP_BLOCK_THRESHOLD,
+    window=config.LOOP_LAG_WINDOW,
+)
+
+
+# Пул соединений с БД и HTTP-клиент NocoDB живут столько же, сколько Dispatcher
+async def on_startup():
+    if config.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if config.METRICS_PORT:
+        start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+    session_counter = fsm_session_counter(storage)
+    if session_counter:
+        track_fsm_sessions(session_counter)
+    track_cache("base", base_cache)
+    await init_pool()
+    await admin_registry.start()
+    if config.BASE_SEARCH_CREATE_INDEX:
+        await ensure_search_index()
+    # Клиент передается в хендлеры как аргумент `nocodb`
+    dp["nocodb"] = NocodbClient(NOCODB_BASE_URL or "", NOCODB_API_TOKEN or "")
+
+
+async def on_shutdown():
+    nocodb = dp.workflow_data.pop("nocodb", None)
+    if nocodb:
+        await nocodb.close()
+    await admin_registry.stop()
+    await outbox.close()
+    await close_pool()
+    await loop_monitor.stop()
+
+
+dp.startup.register(on_startup)
+dp.shutdown.register(on_shutdown)
+
+
+async def register_webhook():
+    """Регистрирует вебхук с allowed_updates по фактически используемым роутерам."""
+    url = f"{config.WEBHOOK_URL}{config.WEBHOOK_PATH}"
+    await bot.set_webhook(
+        url,
+        secret_token=config.WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("Вебхук зарегистрирован: {}", url)
+
+
+async def run_webhook():
+    """Принимает апдейты по HTTP и сразу отвечает 200, обрабатывая их в фоне."""
+    from aiohttp import web
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+    if not config.WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET не задан: запросы к вебхуку не проверяются")
+    if config.WEBHOOK_REGISTER:
+        if not config.WEBHOOK_URL:
+            raise RuntimeError("Для регистрации вебхука нужен WEBHOOK_URL")
+        dp.startup.register(register_webhook)
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=config.WEBHOOK_SECRET,
+    ).register(app, path=config.WEBHOOK_PATH)
+    # Связывает startup/shutdown Dispatcher с жизненным циклом aiohttp
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT).start()
+        logger.info(
+            f"✅ Бот запущен в режиме вебхука на "
+            f"{config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}"
+        )
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
 
 # Запуск бота
 async def main():
+    if config.BOT_MODE == "webhook":
+        await run_webhook()
+        return
     logger.info("✅ Бот запущен и слушает команды...")
-    await dp.start_polling(bot)
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
 if __name__ == '__main__':
-    import asyncio
-
     asyncio.run(main())
@@ -1,75 +1,96 @@
 from __future__ import annotations
 
-import psycopg2
+from enum import Enum
+
 from aiogram.fsm.context import FSMContext
 from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import State, StatesGroup
 from logger_config import logger
-from bot.handlers.find_user import get_connection, get_user, is_valid_email
+from bot.handlers.find_user import is_valid_email
+from bot.services.db import QUERY_ERRORS, execute, fetchrow, get_connection
 from aiogram.filters import Command
-from bot.services.find_base_id import get_base_id_by_all
+from bot.services.find_base_id import base_choice_keyboard, chosen_base_title, get_base_id_by_all, search_bases
+from bot.services.project_users import invalidate_project_users
 
-router = Router()
+router = Router(name="add")
 
 # Определяем состояния для FSM
 class AddUserState(StatesGroup):
     waiting_for_base = State()
     waiting_for_user_id = State()
 
+class GrantResult(Enum):
+    """Результат выдачи доступа к базе."""
+    CREATED = "created"
+    ALREADY_EXISTS = "already_exists"
+    USER_NOT_FOUND = "user_not_found"
+    ERROR = "error"
+
+
+# Ключ общей advisory-блокировки выдач: одиночные выдачи берут её разделяемой,
+# массовая выдача (bulk_add) — эксклюзивной
+GRANT_LOCK_KEY = 7_310_001
+
+# Сериализует конкурентные выдачи одной и той же пары (база, email):
+# у nc_base_users_v2 нет уникального ключа, на который можно опереться в ON CONFLICT
+GRANT_LOCK_QUERY = f"""
+SELECT
+    pg_advisory_xact_lock_shared({GRANT_LOCK_KEY}::bigint),
+    pg_advisory_xact_lock(hashtext($1::text), hashtext($2::text))
+"""
+
+# Находит пользователя по email и добавляет строку доступа, только если её ещё нет
+GRANT_QUERY = """
+WITH target_user AS (
+    SELECT id FROM nc_users_v2 WHERE email = $2 LIMIT 1
+),
+inserted AS (
+    INSERT INTO nc_base_users_v2 (base_id, fk_user_id, roles)
+    SELECT $1, target_user.id, 'editor'
+    FROM target_user
+    WHERE NOT EXISTS (
+        SELECT 1 FROM nc_base_users_v2
+        WHERE base_id = $1 AND fk_user_id = target_user.id
+    )
+    RETURNING fk_user_id
+)
+SELECT
+    (SELECT id FROM target_user) AS user_id,
+    EXISTS (SELECT 1 FROM inserted) AS created
+"""
+
+
 # Функция для добавления пользователя в базу
-def assign_user_to_base(base_id: str, email: str) -> bool:
-    """Добавляет пользователя в базу и возвращает True, если операция успешна."""
-    logger.info(f"Попытка добавить пользователя {email} в базу {base_id}")
-
-    conn = get_connection()
-    if not conn:
-        logger.error("Ошибка подключения к базе данных")
-        return False
-
-    # Получаем ID пользователя по email
-    user_data = get_user(email)
-    if not user_data:
-        logger.warning(f"Пользователь с email {email} не найден.")
-        return False
-
-    user_id = user_data.get("id")
-    if not user_id:
-        logger.error(f"Ошибка: у пользователя {email} отсутствует ID.")
-        return False
+async def assign_user_to_base(base_id: str, email: str) -> GrantResult:
+    """Добавляет пользователя в базу одним запросом на одном соединении из пула."""
+    logger.info("Попытка добавить пользователя {} в базу {}", email, base_id)
 
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 FROM nc_base_users_v2 WHERE base_id = %s AND fk_user_id = %s",
-                (base_id, user_id)
-            )
-            exists = cursor.fetchone()
-            if exists:
-                logger.warning(f"Пользователь {email} уже имеет доступ к базе {base_id}.")
-                return False  # Уже есть доступ, не добавляем повторно
-
-            # Добавляем пользователя в базу
-            cursor.execute(
-                "INSERT INTO nc_base_users_v2 (base_id, fk_user_id, roles) VALUES (%s, %s, 'editor')",
-                (base_id, user_id)
-            )
-        conn.commit()
-        logger.info(f"✅ Пользователь {email} добавлен в базу (ID: {base_id})")
-        return True
-    except psycopg2.Error as e:
-        logger.error(f"Ошибка при добавлении пользователя: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
-        logger.info("Соединение с базой данных закрыто.")
+        async with get_connection() as conn:
+            async with conn.transaction():
+                await execute(conn, "grant_lock", GRANT_LOCK_QUERY, base_id, email, explain=False)
+                row = await fetchrow(conn, "grant", GRANT_QUERY, base_id, email)
+    except QUERY_ERRORS as e:
+        logger.error("Ошибка при добавлении пользователя: {}", e)
+        return GrantResult.ERROR
+
+    if not row or not row["user_id"]:
+        logger.warning("Пользователь с email {} не найден.", email)
+        return GrantResult.USER_NOT_FOUND
+    if not row["created"]:
+        logger.warning("Пользователь {} уже имеет доступ к базе {}.", email, base_id)
+        return GrantResult.ALREADY_EXISTS
+
+    logger.info("✅ Пользователь {} добавлен в базу (ID: {})", email, base_id)
+    invalidate_project_users([base_id])
+    return GrantResult.CREATED
 
 # Хендлер callback-кнопки "add"
 @router.callback_query(lambda c: c.data == "add")
 async def cmd_add(callback: CallbackQuery, state: FSMContext):
     """Начинает процесс добавления пользователя в базу."""
-    logger.info(f"Пользователь {callback.from_user.id} начал процесс добавления.")
+    logger.info("Пользователь {} начал процесс добавления.", callback.from_user.id)
     if callback.message:
 
         await callback.message.answer("Введите название магазина:")
@@ -79,7 +100,7 @@ async def cmd_add(callback: CallbackQuery, state: FSMContext):
     return
 
 # Хендлер получения названия базы
-@router.message(AddUserState.waiting_for_base)
+@router.message(AddUserState.waiting_for_base, flags={"cost": 2})
 async def process_base_name(message: Message, state: FSMContext):
     """Проверяет, существует ли база, и запрашивает email пользователя."""
     if message.text:
@@ -88,27 +109,49 @@ async def process_base_name(message: Message, state: FSMContext):
         await message.answer("pusto")
         return
     if message.from_user:
-        logger.info(f"Получено название базы: '{base_title}' от пользователя {message.from_user.id}")
+        logger.info("Получено название базы: '{}' от пользователя {}", base_title, message.from_user.id)
     else:
-        logger.info(f"📨Получено название базы: '{base_title}' от неизвестного пользователя")
+        logger.info("📨Получено название базы: '{}' от неизвестного пользователя", base_title)
 
     try:
-        base_id = get_base_id_by_all(base_title)
+        base_id = await get_base_id_by_all(base_title)
         if base_id:
-            logger.info(f"База найдена: {base_id}")
+            logger.info("База найдена: {}", base_id)
             await message.answer("Магазин найден! Теперь введите e-mail пользователя:")
             await state.update_data(base_id=base_id)
             await state.set_state(AddUserState.waiting_for_user_id)
         else:
+            similar = await search_bases(base_title)
+            if similar:
+                # Остаемся в waiting_for_base: можно выбрать кнопкой или ввести название заново
+                await message.answer(
+                    "Магазин не найден. Возможно, вы имели в виду:",
+                    reply_markup=base_choice_keyboard(similar, "add_base"),
+                )
+                return
             await message.answer("База данных не найдена.")
             await state.clear()
     except Exception as e:
-        logger.error(f"Ошибка при поиске базы: {e}")
+        logger.error("Ошибка при поиске базы: {}", e)
         await message.answer("Произошла ошибка. Попробуйте позже.")
         await state.clear()
 
+# Хендлер выбора базы из предложенных вариантов
+@router.callback_query(AddUserState.waiting_for_base, lambda c: c.data and c.data.startswith("add_base:"))
+async def process_base_choice(callback: CallbackQuery, state: FSMContext):
+    """Запоминает выбранную кнопкой базу и запрашивает email пользователя."""
+    data = callback.data or ""
+    base_id = data.split(":", 1)[1]
+    logger.info("Пользователь {} выбрал базу {}", callback.from_user.id, base_id)
+    await state.update_data(base_id=base_id)
+    await state.set_state(AddUserState.waiting_for_user_id)
+    if isinstance(callback.message, Message):
+        title = chosen_base_title(callback.message.reply_markup, data, base_id)
+        await callback.message.edit_text(f"Выбран магазин {title}. Теперь введите e-mail пользователя:")
+    await callback.answer()
+
 # Хендлер получения email пользователя и добавления в базу
-@router.message(AddUserState.waiting_for_user_id)
+@router.message(AddUserState.waiting_for_user_id, flags={"cost": 5})
 async def process_user_id(message: Message, state: FSMContext):
     """Добавляет пользователя в найденную базу."""
     if message.text:
@@ -117,9 +160,9 @@ async def process_user_id(message: Message, state: FSMContext):
         await message.answer("pusto")
         return
     if message.from_user:
-        logger.info(f"Получен e-mail пользователя: '{email}' от {message.from_user.id}")
+        logger.info("Получен e-mail пользователя: '{}' от {}", email, message.from_user.id)
     else:
-        logger.info(f"Получен e-mail пользователя: '{email}' от unknown user")
+        logger.info("Получен e-mail пользователя: '{}' от unknown user", email)
 
     if not is_valid_email(email):
         await message.answer("Введите корректный e-mail.")
@@ -132,29 +175,33 @@ async def process_user_id(message: Message, state: FSMContext):
     if not base_id:
         if message.from_user:
 
-            logger.error(f"Ошибка: base_id не найден в state для пользователя {message.from_user.id}")
+            logger.error("Ошибка: base_id не найден в state для пользователя {}", message.from_user.id)
         else:
-            logger.error(f"Ошибка: base_id не найден в state для unknown")
+            logger.error("Ошибка: base_id не найден в state для unknown")
 
         await message.answer("Ошибка! Попробуйте снова.")
         await state.clear()
         return
 
-    logger.info(f"Добавление пользователя {email} в базу с ID {base_id}")
+    logger.info("Добавление пользователя {} в базу с ID {}", email, base_id)
 
 
-    # Выполняем SQL-зап
-    success = assign_user_to_base(base_id, email)
+    # Выполняем SQL-запрос
+    result = await assign_user_to_base(base_id, email)
 
-    if success:
-        logger.info(f"✅ Пользователь {email} успешно добавлен в базу {base_id}.")
+    if result is GrantResult.CREATED:
+        logger.info("✅ Пользователь {} успешно добавлен в базу {}.", email, base_id)
         await message.answer(f"Пользователь {email} успешно добавлен в базу!")
+    elif result is GrantResult.ALREADY_EXISTS:
+        await message.answer(f"У пользователя {email} уже есть доступ к этой базе.")
+    elif result is GrantResult.USER_NOT_FOUND:
+        await message.answer(f"Пользователь с email {email} не найден.")
     else:
-        logger.error(f"❌ Ошибка при добавлении пользователя {email} в базу {base_id}.")
+        logger.error("❌ Ошибка при добавлении пользователя {} в базу {}.", email, base_id)
         await message.answer(
-            f"Ошибка при добавлении пользователя {email}. Возможно, у него уже есть доступ или произошла внутренняя ошибка.")
+            f"Ошибка при добавлении пользователя {email}. Произошла внутренняя ошибка, попробуйте позже.")
 
     # Очищаем состояние FSM
     await state.clear()
     if message.from_user:
-        logger.info(f"Состояние FSM очищено для пользователя {message.from_user.id}.")
\ No newline at end of file
+        logger.info("Состояние FSM очищено для пользователя {}.", message.from_user.id)
\ No newline at end of file
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import html
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from aiogram import Bot, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Message
+
+import config
+from bot.handlers.add import GRANT_LOCK_KEY
+from bot.handlers.find_user import is_valid_email
+from bot.services.bulk_import import BulkImportError, GrantRow, read_grant_rows
+from bot.services.db import QUERY_ERRORS, copy_records, execute, fetch, get_connection
+from bot.services.project_users import invalidate_project_users
+from logger_config import logger
+
+router = Router(name="bulk_add")
+
+# Сколько примеров проблемных строк показывать в отчете
+REPORT_SAMPLE_SIZE = 10
+
+
+class BulkAddState(StatesGroup):
+    waiting_for_document = State()
+
+
+@dataclass
+class BulkGrantReport:
+    """Итог массовой выдачи доступа."""
+    rows: int = 0
+    granted: int = 0
+    already_granted: int = 0
+    invalid_emails: List[int] = field(default_factory=list)
+    unknown_bases: Set[str] = field(default_factory=set)
+    unknown_users: Set[str] = field(default_factory=set)
+
+    def render(self) -> str:
+        lines = [
+            "📋 Массовая выдача доступа завершена:",
+            f"Строк в файле: {self.rows}",
+            f"✅ Выдано доступов: {self.granted}",
+            f"➖ Уже был доступ: {self.already_granted}",
+        ]
+        if self.invalid_emails:
+            sample = ", ".join(map(str, self.invalid_emails[:REPORT_SAMPLE_SIZE]))
+            lines.append(f"⚠ Некорректный e-mail в {len(self.invalid_emails)} строках (строки: {sample})")
+        if self.unknown_bases:
+            # Значения из присланного файла: экранируем, сообщение уходит в HTML-режиме
+            sample = ", ".join(map(html.escape, sorted(self.unknown_bases)[:REPORT_SAMPLE_SIZE]))
+            lines.append(f"⚠ Не найдено магазинов: {len(self.unknown_bases)} ({sample})")
+        if self.unknown_users:
+            sample = ", ".join(map(html.escape, sorted(self.unknown_users)[:REPORT_SAMPLE_SIZE]))
+            lines.append(f"⚠ Не найдено пользователей: {len(self.unknown_users)} ({sample})")
+        return "\n".join(lines)
+
+
+# Базы по ID или названию одним запросом; совпадение по ID приоритетнее
+RESOLVE_BASES_QUERY = """
+SELECT id, title FROM nc_bases_v2
+WHERE id = ANY($1::text[]) OR title = ANY($1::text[])
+"""
+
+RESOLVE_USERS_QUERY = "SELECT id, email FROM nc_users_v2 WHERE email = ANY($1::text[])"
+
+CREATE_TMP_QUERY = """
+CREATE TEMP TABLE tmp_bulk_grants (base_id text, fk_user_id text) ON COMMIT DROP
+"""
+
+# Вставляет только отсутствующие пары; эксклюзивная блокировка GRANT_LOCK_KEY
+# не дает одиночным выдачам вставить те же строки параллельно
+BULK_INSERT_QUERY = """
+INSERT INTO nc_base_users_v2 (base_id, fk_user_id, roles)
+SELECT DISTINCT g.base_id, g.fk_user_id, 'editor'
+FROM tmp_bulk_grants AS g
+WHERE NOT EXISTS (
+    SELECT 1 FROM nc_base_users_v2 AS bu
+    WHERE bu.base_id = g.base_id AND bu.fk_user_id = g.fk_user_id
+)
+RETURNING base_id, fk_user_id
+"""
+
+
+def _resolve_bases(rows: List[Dict], inputs: Set[str]) -> Dict[str, str]:
+    """Сопоставляет введенные ID/названия с ID баз (ID важнее названия)."""
+    by_id = {row["id"]: row["id"] for row in rows if row["id"] in inputs}
+    by_title = {row["title"]: row["id"] for row in rows if row["title"] in inputs}
+    return {**by_title, **by_id}
+
+
+async def bulk_assign(grants: List[GrantRow]) -> BulkGrantReport:
+    """Выдает доступы из списка строк файла набором set-based запросов в одной транзакции."""
+    report = BulkGrantReport(rows=len(grants))
+
+    pairs: Set[Tuple[str, str]] = set()
+    for line_no, email, base in grants:
+        if not is_valid_email(email):
+            report.invalid_emails.append(line_no)
+            continue
+        pairs.add((email, base))
+    if not pairs:
+        return report
+
+    emails = {email for email, _ in pairs}
+    bases = {base for _, base in pairs}
+
+    async with get_connection() as conn:
+        base_ids = _resolve_bases(
+            [dict(row) for row in await fetch(conn, "bulk_resolve_bases", RESOLVE_BASES_QUERY, list(bases))],
+            bases,
+        )
+        users = await fetch(conn, "bulk_resolve_users", RESOLVE_USERS_QUERY, list(emails))
+        user_ids = {row["email"]: row["id"] for row in users}
+
+        report.unknown_bases = bases - base_ids.keys()
+        report.unknown_users = emails - user_ids.keys()
+
+        records = {
+            (base_ids[base], user_ids[email])
+            for email, base in pairs
+            if base in base_ids and email in user_ids
+        }
+        if not records:
+            return report
+
+        async with conn.transaction():
+            await execute(
+                conn, "bulk_grant_lock", "SELECT pg_advisory_xact_lock($1::bigint)", GRANT_LOCK_KEY, explain=False
+            )
+            await execute(conn, "bulk_create_tmp", CREATE_TMP_QUERY)
+            await copy_records(conn, "bulk_copy", "tmp_bulk_grants", records, ["base_id", "fk_user_id"])
+            inserted = await fetch(conn, "bulk_insert", BULK_INSERT_QUERY)
+
+    invalidate_project_users(row["base_id"] for row in inserted)
+    report.granted = len(inserted)
+    report.already_granted = len(records) - report.granted
+    return report
+
+
+@router.callback_query(lambda c: c.data == "bulk_add")
+async def cmd_bulk_add(callback: CallbackQuery, state: FSMContext):
+    """Начинает массовую выдачу доступа из файла."""
+    logger.info("Пользователь {} начал массовую выдачу доступа.", callback.from_user.id)
+    if callback.message:
+        await callback.message.answer(
+            "Отправьте файл .csv или .xlsx: в первом столбце e-mail, во втором ID или название магазина."
+        )
+        await state.set_state(BulkAddState.waiting_for_document)
+        await callback.answer()
+        return
+    await callback.answer("caput.", show_alert=True)
+
+
+@router.message(BulkAddState.waiting_for_document, flags={"cost": 10})
+async def process_document(message: Message, state: FSMContext, bot: Bot):
+    """Разбирает файл и выдает все доступы из него."""
+    document = message.document
+    if not document:
+        await message.answer("Пришлите файл .csv или .xlsx документом.")
+        return
+    if document.file_size and document.file_size > config.BULK_MAX_FILE_SIZE:
+        await message.answer("Файл слишком большой.")
+        await state.clear()
+        return
+
+    logger.info("Получен файл '{}' ({} байт) для массовой выдачи", document.file_name, document.file_size)
+    try:
+        stream = await bot.download(document)
+        if stream is None:
+            raise BulkImportError("Не удалось скачать файл")
+        # Разбор XLSX на десятках тысяч строк занимает секунды: уводим его из event loop
+        grants = await asyncio.to_thread(
+            read_grant_rows, stream, document.file_name or "", config.BULK_MAX_ROWS
+        )
+
+        report = await bulk_assign(grants)
+        logger.info("Массовая выдача: {} выдано, {} уже было", report.granted, report.already_granted)
+        await message.answer(report.render())
+    except BulkImportError as e:
+        logger.warning("Файл массовой выдачи отклонен: {}", e)
+        await message.answer(f"Не удалось обработать файл: {html.escape(str(e))}")
+    except QUERY_ERRORS as e:
+        logger.error("Ошибка базы данных при массовой выдаче: {}", e)
+        await message.answer("Ошибка базы данных. Ни один доступ не выдан, попробуйте позже.")
+    except Exception as e:
+        logger.error("Ошибка при массовой выдаче доступа: {}", e)
+        await message.answer("Произошла ошибка. Попробуйте позже.")
+
+    await state.clear()
@@ -2,9 +2,8 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-import config
 from logger_config import logger
-router = Router()
+router = Router(name="admin")
 
 # Создаём клавиатуру
 admin_keyboard = InlineKeyboardMarkup(
@@ -18,9 +17,15 @@ admin_keyboard = InlineKeyboardMarkup(
         [
             InlineKeyboardButton(text='Предоставить доступ пользователю', callback_data='add'),
         ],
+        [
+            InlineKeyboardButton(text='Массовая выдача доступа из файла', callback_data='bulk_add'),
+        ],
         [
             InlineKeyboardButton(text='Удалить пользователя', callback_data='delete'),
         ],
+        [
+            InlineKeyboardButton(text='Отключить пользователя от всех магазинов', callback_data='offboard'),
+        ],
         [
             InlineKeyboardButton(text='К каким магазинам есть доступ', callback_data='who'),
         ]
@@ -28,19 +33,11 @@ admin_keyboard = InlineKeyboardMarkup(
 )
 @router.message(Command("admin"))
 async def admin_command(message: types.Message):
-    """Отправляет админ-клавиатуру."""
-
-    user_id = getattr(message.from_user, "id", None)
-    if user_id:
-        logger.info(f"Пользователь {user_id} вызвал команду /admin")
-        if user_id in config.ADMIN_IDS:
-        # Дальнейшие действия
-
-            try:
-                await message.answer("Добро пожаловать в Админ-панель!", reply_markup=admin_keyboard)
-                logger.info("Сообщение с админ-кнопками успешно отправлено")
-            except Exception as e:
-                logger.error(f"Ошибка при отправке клавиатуры админа: {e}")
-        else:
-            await message.answer("У вас нет доступа")
+    """Отправляет админ-клавиатуру. Права проверяет AdminAuthMiddleware."""
 
+    logger.info("Пользователь {} вызвал команду /admin", getattr(message.from_user, "id", None))
+    try:
+        await message.answer("Добро пожаловать в Админ-панель!", reply_markup=admin_keyboard)
+        logger.info("Сообщение с админ-кнопками успешно отправлено")
+    except Exception as e:
+        logger.error("Ошибка при отправке клавиатуры админа: {}", e)
@@ -1,15 +1,17 @@
-import psycopg2
+from typing import Dict, List, Optional
 from aiogram.fsm.context import FSMContext
 from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import State, StatesGroup
 from logger_config import logger
-from bot.handlers.find_user import get_connection, is_valid_email, get_user
-from bot.services.find_base_id import get_base_id_by_all
+from bot.handlers.find_user import is_valid_email, get_user
+from bot.services.db import QUERY_ERRORS, fetch, get_connection
+from bot.services.find_base_id import base_choice_keyboard, chosen_base_title, extract_project_id, search_bases
+from bot.services.project_users import invalidate_project_users
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 
-router = Router()
+router = Router(name="delete")
 
 # Определяем состояния для FSM
 class DeleteState(StatesGroup):
@@ -17,47 +19,53 @@ class DeleteState(StatesGroup):
     WAITING_FOR_USER_INPUT_BASE = State()
 
 
-def delete_user(email: str, base_id: str) -> bool:
-    """Удаляет пользователя по email и возвращает True, если удаление прошло успешно."""
-    logger.info(f"🔄 Попытка удаления пользователя {email} из базы {base_id}...")
+# Удаляет доступ пользователя к одной базе, найденной по ID или названию, за один запрос.
+# Как и при выдаче (RESOLVE_BASE_QUERY), совпадение по ID приоритетнее совпадения по названию
+REVOKE_QUERY = """
+DELETE FROM nc_base_users_v2 AS bu
+USING nc_users_v2 AS u, nc_bases_v2 AS b
+WHERE bu.fk_user_id = u.id
+  AND bu.base_id = b.id
+  AND u.email = $1
+  AND b.id = (
+      SELECT id FROM nc_bases_v2
+      WHERE id = $2 OR title = $2
+      ORDER BY (id = $2) DESC
+      LIMIT 1
+  )
+RETURNING b.id AS base_id, b.title
+"""
+
+
+async def delete_user(email: str, base_input: str) -> Optional[List[Dict]]:
+    """Удаляет доступ пользователя к базе и возвращает удаленные строки (None при ошибке)."""
+    logger.info("🔄 Попытка удаления пользователя {} из базы {}...", email, base_input)
 
-    user_data = get_user(email)
-    if not user_data:
-        logger.warning(f"⚠ Пользователь с email {email} не найден.")
-        return False
-
-    user_id = user_data.get('id')
-    logger.info(f"✅ ID пользователя найден: {user_id}")
-
-    conn = get_connection()
-    if not conn:
-        logger.error("❌ Ошибка подключения к базе данных")
-        return False
-    basic_id = get_base_id_by_all(base_id)
     try:
-        with conn.cursor() as cursor:
-            logger.info(f"🗑 Выполняем SQL-запрос на удаление пользователя {user_id} из базы {base_id}...")
-            cursor.execute(
-                "DELETE FROM nc_base_users_v2 WHERE fk_user_id = %s AND base_id = %s",
-                (user_id, basic_id)
-            )
-        conn.commit()
-        logger.info(f"✅ Пользователь {email} (ID: {user_id}) успешно удален из базы (ID: {basic_id})")
-        return True
-    except psycopg2.Error as e:
-        logger.error(f"❌ Ошибка удаления из базы: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
-        logger.info("🔒 Соединение с базой данных закрыто.")
+        base_id_or_title = extract_project_id(base_input)
+        async with get_connection() as conn:
+            rows = await fetch(conn, "revoke", REVOKE_QUERY, email, base_id_or_title)
+    except ValueError as e:
+        logger.error("❌ Некорректный ввод базы: {}", e)
+        return None
+    except QUERY_ERRORS as e:
+        logger.error("❌ Ошибка удаления из базы: {}", e)
+        return None
+
+    deleted = [dict(row) for row in rows]
+    if deleted:
+        logger.info("✅ Пользователь {} удален из баз: {}", email, [row['base_id'] for row in deleted])
+        invalidate_project_users(row["base_id"] for row in deleted)
+    else:
+        logger.warning("⚠ Доступ пользователя {} к базе '{}' не найден, ничего не удалено.", email, base_id_or_title)
+    return deleted
 
 
 # Хендлер для обработки нажатия инлайн-кнопки
 @router.callback_query(lambda c: c.data == "delete")
 async def start_delete_process(callback: CallbackQuery, state: FSMContext):
     """Начинает процесс удаления пользователя по нажатию инлайн-кнопки."""
-    logger.info(f"📌 Пользователь {callback.from_user.id} нажал кнопку 'Удалить пользователя'")
+    logger.info("📌 Пользователь {} нажал кнопку 'Удалить пользователя'", callback.from_user.id)
     if callback.message:
 
         await callback.message.answer("Введите e-mail пользователя, которого нужно удалить:")
@@ -77,29 +85,29 @@ async def process_email_input(message: Message, state: FSMContext):
         await message.answer("Ошибка: сообщение пустое.")
         return
     if message.from_user:
-        logger.info(f"📨 Получен email: '{email_input}' от пользователя {message.from_user.id}")
+        logger.info("📨 Получен email: '{}' от пользователя {}", email_input, message.from_user.id)
     else:
-        logger.info(f"📨 Получен email: '{email_input}' от неизвестного пользователя")
+        logger.info("📨 Получен email: '{}' от неизвестного пользователя", email_input)
     if not is_valid_email(email_input):
-        logger.warning(f"⚠ Некорректный email: {email_input}")
+        logger.warning("⚠ Некорректный email: {}", email_input)
         await message.answer("Пожалуйста, введите корректный e-mail.")
         return
 
-    user_data = get_user(email_input)
+    user_data = await get_user(email_input)
     if not user_data:
-        logger.warning(f"⚠ Пользователь с email {email_input} не найден.")
+        logger.warning("⚠ Пользователь с email {} не найден.", email_input)
         await message.answer(f"Пользователь с email {email_input} не найден.")
         await state.clear()
         return
 
     await state.update_data(email_input=email_input)
-    logger.info(f"✅ Email пользователя {email_input} принят, запросим ID магазина")
+    logger.info("✅ Email пользователя {} принят, запросим ID магазина", email_input)
     await message.answer("Введите ID магазина или его название:")
     await state.set_state(DeleteState.WAITING_FOR_USER_INPUT_BASE)
 
 
 # Хендлер для получения ID магазина и выполнения удаления
-@router.message(DeleteState.WAITING_FOR_USER_INPUT_BASE)
+@router.message(DeleteState.WAITING_FOR_USER_INPUT_BASE, flags={"cost": 5})
 async def process_base_input(message: Message, state: FSMContext):
     """Обрабатывает ввод ID магазина и выполняет удаление."""
     if message.text:
@@ -108,29 +116,69 @@ async def process_base_input(message: Message, state: FSMContext):
         await message.answer("Ошибка: сообщение пустое.")
         return
     if message.from_user:
-        logger.info(f"🏢 Получен ID магазина: '{base_input}' от пользователя {message.from_user.id}")
+        logger.info("🏢 Получен ID магазина: '{}' от пользователя {}", base_input, message.from_user.id)
 
     data = await state.get_data()
     email = data.get("email_input")
-    logger.info(f"📨 Проверяем возможность удаления пользователя {email} из базы {base_input}...")
+    logger.info("📨 Проверяем возможность удаления пользователя {} из базы {}...", email, base_input)
 
     try:
         if not email or not base_input:
             await message.answer("Ошибка: отсутствует email или ID магазина.")
             return
 
-        success = delete_user(email, base_input)
-        if success:
-            logger.info(f"✅ Пользователь {email} успешно удален из магазина {base_input}.")
-            await message.answer(f"Пользователь {email} успешно удален из магазина {base_input}.")
+        deleted = await delete_user(email, base_input)
+        if deleted:
+            titles = ", ".join(row["title"] or row["base_id"] for row in deleted)
+            logger.info("✅ Пользователь {} успешно удален из магазина {}.", email, base_input)
+            await message.answer(f"Пользователь {email} успешно удален из магазина {titles}.")
+        elif deleted is not None:
+            similar = [base for base in await search_bases(base_input) if base_input not in (base["id"], base["title"])]
+            if similar:
+                # Остаемся в WAITING_FOR_USER_INPUT_BASE: можно выбрать кнопкой или ввести заново
+                await message.answer(
+                    f"Ничего не удалено по запросу «{base_input}». Похожие магазины — из какого удалить {email}?",
+                    reply_markup=base_choice_keyboard(similar, "delete_base"),
+                )
+                return
+            await message.answer(
+                f"Ничего не удалено: у пользователя {email} нет доступа к магазину {base_input} "
+                f"или такой магазин не найден.")
         else:
-            logger.error(f"❌ Ошибка при удалении пользователя {email} из магазина {base_input}.")
-            await message.answer(f"Ошибка при удалении пользователя {email}. Возможно, он не существует в базе.")
+            logger.error("❌ Ошибка при удалении пользователя {} из магазина {}.", email, base_input)
+            await message.answer(f"Ошибка при удалении пользователя {email}. Попробуйте позже.")
     except Exception as e:
-        logger.error(f"⚠ Ошибка при удалении пользователя: {e}")
+        logger.error("⚠ Ошибка при удалении пользователя: {}", e)
         await message.answer("Произошла ошибка при удалении пользователя. Попробуйте позже.")
 
     await state.clear()
     if message.from_user:
-        logger.info(f"♻ Состояние FSM очищено для пользователя {message.from_user.id}.")
+        logger.info("♻ Состояние FSM очищено для пользователя {}.", message.from_user.id)
+
+
+# Хендлер выбора магазина из предложенных вариантов
+@router.callback_query(
+    DeleteState.WAITING_FOR_USER_INPUT_BASE,
+    lambda c: c.data and c.data.startswith("delete_base:"),
+    flags={"cost": 5},
+)
+async def process_base_choice(callback: CallbackQuery, state: FSMContext):
+    """Удаляет пользователя из выбранного кнопкой магазина."""
+    data = callback.data or ""
+    base_id = data.split(":", 1)[1]
+    email = (await state.get_data()).get("email_input")
+    if not email or not isinstance(callback.message, Message):
+        await callback.answer("Ошибка! Попробуйте снова.", show_alert=True)
+        await state.clear()
+        return
 
+    title = chosen_base_title(callback.message.reply_markup, data, base_id)
+    deleted = await delete_user(email, base_id)
+    if deleted:
+        await callback.message.edit_text(f"Пользователь {email} успешно удален из магазина {title}.")
+    elif deleted is not None:
+        await callback.message.edit_text(f"Ничего не удалено: у пользователя {email} нет доступа к магазину {title}.")
+    else:
+        await callback.message.edit_text(f"Ошибка при удалении пользователя {email}. Попробуйте позже.")
+    await callback.answer()
+    await state.clear()
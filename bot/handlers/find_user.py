@@ -1,10 +1,10 @@
-from typing import Optional, List, Dict
-import psycopg2
+from typing import Optional, Dict
 from aiogram.fsm.context import FSMContext
 from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import State, StatesGroup
-from logger_config import logger
+from logger_config import logger, sampled_logger
+from bot.services.db import fetch_records
 import config
 import re
 from datetime import datetime, timezone
@@ -12,63 +12,20 @@ from dateutil.parser import isoparse
 
 
 
-router = Router()
+router = Router(name="find")
 
 now = datetime.now(timezone.utc)
 
 
-# Параметры подключения к базе данных
-DB_NAME = config.DB_NAME
-DB_USER = config.DB_USER
-DB_PASSWORD = config.DB_PASSWORD
-DB_HOST = config.DB_HOST
-DB_PORT = config.DB_PORT
-
-def get_connection():
-    """Создает и возвращает соединение с базой данных."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        logger.info("Успешное подключение к базе данных")
-        return conn
-    except psycopg2.Error as e:
-        logger.error(f"Ошибка подключения к базе данных: {e}")
-        return None
-
-def fetch_records(query: str, params: Optional[tuple] = None) -> List[Dict]:
-    """Выполняет SQL-запрос и возвращает результат в виде списка словарей."""
-    conn = get_connection()
-    if not conn:
-        return []
-
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(query, params)
-            column_names = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            records = [dict(zip(column_names, row)) for row in rows]
-            logger.info(f"Успешно выполнено: {query}")
-            return records
-    except psycopg2.Error as e:
-        logger.error(f"Ошибка выполнения запроса: {e}")
-        return []
-    finally:
-        conn.close()
-
-def get_user(email: str) -> Optional[Dict]:
+async def get_user(email: str) -> Optional[Dict]:
     """Возвращает информацию о пользователе по email."""
-    query = "SELECT * FROM nc_users_v2 WHERE email = %s"
-    records = fetch_records(query, (email,))
+    query = "SELECT * FROM nc_users_v2 WHERE email = $1"
+    records = await fetch_records("get_user", query, email)
     if records:
-        logger.info(f"Найден пользователь: {records[0]}")
+        logger.info("Найден пользователь: {}", records[0].get("id"))
         return records[0]
     else:
-        logger.info(f"Пользователь с email {email} не найден")
+        logger.info("Пользователь с email {} не найден", email)
         return None
 
 def is_valid_email(email: str) -> bool:
@@ -89,9 +46,9 @@ async def find_command(callback: CallbackQuery, state: FSMContext):
     await callback.answer("caput.", show_alert=True)
     return
 
-@router.message(UserState.WAITING_FOR_USER_INPUT)
+@router.message(UserState.WAITING_FOR_USER_INPUT, flags={"cost": 2})
 async def handle_user_input(message: Message, state: FSMContext):
-    logger.info(f"Получен ввод: {message.text}")
+    sampled_logger.info("Получен ввод: {}", message.text)
     if message.text:
         user_input = message.text.strip()
     else:
@@ -103,7 +60,7 @@ async def handle_user_input(message: Message, state: FSMContext):
         return
 
     try:
-        user_data = get_user(user_input)
+        user_data = await get_user(user_input)
         if user_data:
             invite_token_expires = user_data.get('invite_token_expires')
             if invite_token_expires:
@@ -135,7 +92,7 @@ async def handle_user_input(message: Message, state: FSMContext):
 
         await message.answer(response_text, parse_mode="HTML")
     except Exception as e:
-        logger.error(f"Ошибка при получении пользователя: {e}")
+        logger.error("Ошибка при получении пользователя: {}", e)
         await message.answer("Ошибка при поиске пользователя. Попробуйте позже.")
 
     await state.clear()
\ No newline at end of file
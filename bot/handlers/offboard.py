@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from aiogram import Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+
+import config
+from bot.handlers.find_user import is_valid_email
+from bot.services.db import QUERY_ERRORS, fetch, fetch_record, get_connection
+from bot.services.project_users import invalidate_project_users
+from logger_config import logger
+
+router = Router(name="offboard")
+
+# Сколько удаленных магазинов перечислять в ответе
+REPORT_SAMPLE_SIZE = 50
+
+
+class OffboardState(StatesGroup):
+    waiting_for_email = State()
+    waiting_for_confirm = State()
+
+
+# Пользователь и число его баз одним агрегирующим запросом
+MEMBERSHIP_COUNT_QUERY = """
+SELECT u.id AS user_id, count(bu.base_id) AS bases
+FROM nc_users_v2 AS u
+LEFT JOIN nc_base_users_v2 AS bu ON bu.fk_user_id = u.id
+WHERE u.email = $1
+GROUP BY u.id
+"""
+
+# Удаляет порцию доступов пользователя и возвращает удаленные базы с названиями.
+# Каждая порция — отдельная короткая транзакция, чтобы не держать блокировки долго.
+OFFBOARD_CHUNK_QUERY = """
+WITH removed AS (
+    DELETE FROM nc_base_users_v2
+    WHERE fk_user_id = $1
+      AND base_id IN (
+          SELECT base_id FROM nc_base_users_v2
+          WHERE fk_user_id = $1
+          ORDER BY base_id
+          LIMIT $2
+      )
+    RETURNING base_id
+)
+SELECT removed.base_id, b.title
+FROM removed
+LEFT JOIN nc_bases_v2 AS b ON b.id = removed.base_id
+"""
+
+confirm_keyboard = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(text='Да, удалить все доступы', callback_data='offboard_confirm'),
+            InlineKeyboardButton(text='Отмена', callback_data='offboard_cancel'),
+        ]
+    ]
+)
+
+
+async def count_memberships(email: str) -> Optional[Dict]:
+    """Возвращает ID пользователя и число баз, к которым у него есть доступ."""
+    return await fetch_record("count_memberships", MEMBERSHIP_COUNT_QUERY, email)
+
+
+async def offboard_user(user_id: str) -> List[Dict]:
+    """Удаляет все доступы пользователя порциями и возвращает список удаленных баз."""
+    chunk_size = config.OFFBOARD_CHUNK_SIZE
+    removed: List[Dict] = []
+    async with get_connection() as conn:
+        while True:
+            rows = await fetch(conn, "offboard_chunk", OFFBOARD_CHUNK_QUERY, user_id, chunk_size)
+            removed.extend(dict(row) for row in rows)
+            invalidate_project_users(row["base_id"] for row in rows)
+            if len(rows) < chunk_size:
+                break
+    logger.info("🗑 Пользователь {} удален из {} баз", user_id, len(removed))
+    return removed
+
+
+def _render_removed(email: str, removed: List[Dict]) -> str:
+    lines = [f"Пользователь {email} удален из {len(removed)} магазинов:"]
+    lines.extend(f"- {row['title'] or row['base_id']}" for row in removed[:REPORT_SAMPLE_SIZE])
+    if len(removed) > REPORT_SAMPLE_SIZE:
+        lines.append(f"... и еще {len(removed) - REPORT_SAMPLE_SIZE}")
+    return "\n".join(lines)
+
+
+@router.callback_query(lambda c: c.data == "offboard")
+async def start_offboard(callback: CallbackQuery, state: FSMContext):
+    """Начинает отключение пользователя от всех магазинов."""
+    logger.info("📌 Пользователь {} начал отключение пользователя от всех магазинов", callback.from_user.id)
+    if callback.message:
+        await callback.message.answer("Введите e-mail пользователя, которого нужно отключить от всех магазинов:")
+        await state.set_state(OffboardState.waiting_for_email)
+        await callback.answer()
+        return
+    await callback.answer("caput.", show_alert=True)
+
+
+@router.message(OffboardState.waiting_for_email, flags={"cost": 2})
+async def process_offboard_email(message: Message, state: FSMContext):
+    """Показывает число затрагиваемых магазинов и просит подтверждение."""
+    email = (message.text or "").strip()
+    if not is_valid_email(email):
+        await message.answer("Пожалуйста, введите корректный e-mail.")
+        return
+
+    membership = await count_memberships(email)
+    if not membership:
+        await message.answer(f"Пользователь с email {email} не найден.")
+        await state.clear()
+        return
+    if not membership["bases"]:
+        await message.answer(f"У пользователя {email} нет доступа ни к одному магазину.")
+        await state.clear()
+        return
+
+    await state.update_data(offboard_email=email, offboard_user_id=membership["user_id"])
+    await state.set_state(OffboardState.waiting_for_confirm)
+    await message.answer(
+        f"У пользователя {email} есть доступ к {membership['bases']} магазинам. Удалить все доступы?",
+        reply_markup=confirm_keyboard,
+    )
+
+
+@router.callback_query(
+    OffboardState.waiting_for_confirm,
+    lambda c: c.data in ("offboard_confirm", "offboard_cancel"),
+    flags={"cost": 10},
+)
+async def process_offboard_confirm(callback: CallbackQuery, state: FSMContext):
+    """Удаляет все доступы пользователя после подтверждения."""
+    data = await state.get_data()
+    await state.clear()
+    if not callback.message:
+        await callback.answer("caput.", show_alert=True)
+        return
+    if callback.data == "offboard_cancel":
+        await callback.message.answer("Отключение отменено.")
+        await callback.answer()
+        return
+
+    email = data.get("offboard_email")
+    user_id = data.get("offboard_user_id")
+    if not user_id or not email:
+        await callback.answer("Ошибка! Попробуйте снова.", show_alert=True)
+        return
+
+    await callback.answer()
+    try:
+        removed = await offboard_user(user_id)
+    except QUERY_ERRORS as e:
+        logger.error("❌ Ошибка при отключении пользователя {}: {}", email, e)
+        await callback.message.answer("Ошибка при удалении доступов. Часть доступов могла остаться, повторите позже.")
+        return
+
+    if removed:
+        await callback.message.answer(_render_removed(email, removed))
+    else:
+        await callback.message.answer(f"Ничего не удалено: у пользователя {email} уже нет доступов.")
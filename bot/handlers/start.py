@@ -1,15 +1,22 @@
-from aiogram import Router, Bot
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+import config
 from bot.services.nocodb_client import NocodbClient
-from config import NOCODB_BASE_URL, NOCODB_API_TOKEN
-from logger_config import logger
+from bot.services.project_users import get_project_users
+from bot.services.pagination import PageStore, build_pages, page_keyboard
+from logger_config import logger, sampled_logger
 from bot.services.find_base_id import extract_project_id
 
 
-router = Router()
+router = Router(name="start")
+
+PAGE_PREFIX = "project_page"
+
+# Страницы уже полученного списка: листание не запрашивает NocoDB повторно
+page_store = PageStore(maxsize=config.PAGE_STORE_MAX_CHATS, ttl=config.PAGE_STORE_TTL)
 
 class ProjectState(StatesGroup):
     WAITING_FOR_PROJECT_INPUT = State()
@@ -28,10 +35,10 @@ async def start_command(callback: CallbackQuery, state: FSMContext):
     return
 
 
-@router.message(ProjectState.WAITING_FOR_PROJECT_INPUT)
-async def handle_project_input(message: Message, state: FSMContext, bot:Bot):
+@router.message(ProjectState.WAITING_FOR_PROJECT_INPUT, flags={"cost": 2})
+async def handle_project_input(message: Message, state: FSMContext, nocodb: NocodbClient):
     """Обрабатывает ввод ID проекта и возвращает список пользователей."""
-    logger.info(f"Получен ввод: {message.text}")
+    sampled_logger.info("Получен ввод: {}", message.text)
     user_input = message.text
 
     try:
@@ -40,34 +47,52 @@ async def handle_project_input(message: Message, state: FSMContext, bot:Bot):
             return
 
         project_id = extract_project_id(user_input)
-        logger.info(f"Извлеченный ID проекта: {project_id}")
+        logger.info("Извлеченный ID проекта: {}", project_id)
     except IndexError:
         await message.answer("Некорректный ввод. Убедитесь, что вы ввели ID или URL.")
         return
     except Exception as e:
-        logger.error(f"Ошибка при извлечении ID проекта: {e}")
+        logger.error("Ошибка при извлечении ID проекта: {}", e)
         await message.answer("Произошла ошибка при обработке вашего запроса. Попробуйте позже.")
         return
 
     try:
-        # Запрашиваем данные о пользователях проекта
-        client = NocodbClient(NOCODB_BASE_URL or "", NOCODB_API_TOKEN or "")
-
-        users = await client.get_project_users(project_id)
+        # Запрашиваем данные о пользователях проекта через кэш и общий клиент
+        users = await get_project_users(nocodb, project_id)
 
         if users and "users" in users and "list" in users["users"]:
             user_list = users["users"]["list"]
-            response = "Пользователи с доступом к проекту:\n"
-            for user in user_list:
-                email = user.get("email", "не указан")
-                roles = user.get("roles", "нет роли")
-                response += f"- {email} (роль: {roles})\n"
-            await message.answer(response)
+            pages = build_pages(
+                "Пользователи с доступом к проекту:",
+                [f"- {user.get('email', 'не указан')} (роль: {user.get('roles', 'нет роли')})" for user in user_list],
+                per_page=config.PROJECT_USERS_PAGE_SIZE,
+            )
+            sent = await message.answer(pages[0], reply_markup=page_keyboard(PAGE_PREFIX, 0, len(pages)))
+            if len(pages) > 1:
+                page_store.save(message.chat.id, sent.message_id, pages)
         else:
             await message.answer("Не удалось получить информацию о пользователях.")
-            logger.error(f"Некорректный формат ответа: {users}")
+            logger.error("Некорректный формат ответа: {}", users)
     except Exception as e:
-        logger.error(f"Ошибка при запросе к NocoDB: {e}")
+        logger.error("Ошибка при запросе к NocoDB: {}", e)
         await message.answer("Произошла ошибка при запросе к серверу. Попробуйте позже.")
 
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith(f"{PAGE_PREFIX}:"))
+async def handle_project_page(callback: CallbackQuery):
+    """Листает список пользователей проекта, редактируя исходное сообщение."""
+    if not isinstance(callback.message, Message):
+        await callback.answer("caput.", show_alert=True)
+        return
+
+    pages = page_store.get(callback.message.chat.id, callback.message.message_id)
+    page_number = (callback.data or "").split(":", 1)[-1]
+    page = int(page_number) if page_number.isdigit() else -1
+    if pages is None or not 0 <= page < len(pages):
+        await callback.answer("Список устарел, запросите его заново.", show_alert=True)
+        return
+
+    await callback.message.edit_text(pages[page], reply_markup=page_keyboard(PAGE_PREFIX, page, len(pages)))
+    await callback.answer()
@@ -1,66 +1,85 @@
-import psycopg2
+from typing import Dict, List, Optional, Sequence, Tuple
 from aiogram.fsm.context import FSMContext
 from aiogram import Router
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.state import State, StatesGroup
 from logger_config import logger
-from bot.handlers.find_user import get_connection, is_valid_email
+from bot.handlers.find_user import is_valid_email
+from bot.services.db import QUERY_ERRORS, fetch, get_connection
+import config
 
 
-router = Router()
+router = Router(name="who")
 
 class WhoState(StatesGroup):
     WAITING_FOR_USER_INPUT = State()
-
-def get_user_bases(email: str) -> list:
-    """Получает список баз данных, к которым у пользователя есть доступ."""
-    conn = None
+    BROWSING = State()
+
+# Базы пользователя одним JOIN-запросом; порядок (title, id) стабилен и служит ключом пагинации.
+# Курсор ($2, $3) = (title, id) последней/первой строки соседней страницы, NULL — первая страница.
+USER_BASES_QUERY = """
+SELECT b.id AS base_id, b.title, bu.roles AS role
+FROM nc_users_v2 AS u
+JOIN nc_base_users_v2 AS bu ON bu.fk_user_id = u.id
+JOIN nc_bases_v2 AS b ON b.id = bu.base_id
+WHERE u.email = $1
+  AND ($2::text IS NULL OR (COALESCE(b.title, ''), b.id) {op} ($2::text, $3::text))
+ORDER BY COALESCE(b.title, '') {direction}, b.id {direction}
+LIMIT $4
+"""
+NEXT_PAGE_QUERY = USER_BASES_QUERY.format(op=">", direction="ASC")
+PREV_PAGE_QUERY = USER_BASES_QUERY.format(op="<", direction="DESC")
+
+Cursor = Sequence[str]
+
+
+async def get_user_bases(
+        email: str,
+        after: Optional[Cursor] = None,
+        before: Optional[Cursor] = None,
+        limit: int = config.WHO_PAGE_SIZE,
+) -> Tuple[List[Dict], bool]:
+    """
+    Получает страницу баз данных, к которым у пользователя есть доступ.
+
+    :param after: курсор (title, id), после которого начинается страница.
+    :param before: курсор (title, id), перед которым заканчивается страница.
+    :return: строки (base_id, title, role) и признак, что в этом направлении есть еще строки.
+    """
+    query, cursor = (PREV_PAGE_QUERY, before) if before else (NEXT_PAGE_QUERY, after)
+    title, base_id = cursor if cursor else (None, None)
     try:
-        conn = get_connection()
-        if not conn:
-            logger.error("❌ Не удалось подключиться к базе данных.")
-            return []
-
-        with conn.cursor() as cursor:
-            logger.info(f"🔍 Поиск пользователя с email: {email}")
-            cursor.execute("SELECT id FROM nc_users_v2 WHERE email = %s", (email,))
-            user = cursor.fetchone()
-
-            if not user:
-                logger.warning(f"⚠ Пользователь {email} не найден.")
-                return []
+        async with get_connection() as conn:
+            logger.info("🔍 Поиск баз пользователя с email: {}", email)
+            rows = await fetch(conn, "user_bases", query, email, title, base_id, limit + 1)
+    except QUERY_ERRORS as e:
+        logger.error("🔥 Ошибка базы данных: {}", e)
+        return [], False
 
-            user_id = user[0]
-            logger.info(f"✅ Найден пользователь с ID: {user_id}")
+    has_more = len(rows) > limit
+    bases = [dict(row) for row in rows[:limit]]
+    if before:
+        bases.reverse()
+    return bases, has_more
 
-            cursor.execute(
-                "SELECT base_id FROM nc_base_users_v2 WHERE fk_user_id = %s AND roles = %s LIMIT 30",
-                (user_id, "editor")
-            )
-            base_ids = [row[0] for row in cursor.fetchall()]
 
-            if not base_ids:
-                logger.warning(f"⚠ У пользователя {user_id} нет доступных баз.")
-                return []
+def _cursor(base: Dict) -> List[str]:
+    return [base["title"] or "", base["base_id"]]
 
-            logger.info(f"📌 Найдены базы: {base_ids}")
 
-            query = f"SELECT id, title FROM nc_bases_v2 WHERE id IN ({','.join(['%s'] * len(base_ids))})"
-            cursor.execute(query, tuple(base_ids))
-            bases = cursor.fetchall()
+def _render_bases(bases: List[Dict], has_prev: bool, has_next: bool) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Формирует текст страницы и клавиатуру навигации."""
+    lines = ["📚 Базы данных, к которым у пользователя есть доступ:"]
+    lines.extend(f"{base['title']} (ID: {base['base_id']}, роль: {base['role']})" for base in bases)
 
-            return [{"id": base[0], "title": base[1]} for base in bases]
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton(text="⬅ Назад", callback_data="who_prev"))
+    if has_next:
+        buttons.append(InlineKeyboardButton(text="Далее ➡", callback_data="who_next"))
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return "\n".join(lines), keyboard
 
-    except psycopg2.Error as e:
-        logger.error(f"🔥 Ошибка базы данных: {e}")
-        return []
-    except Exception as e:
-        logger.error(f"🔥 Неожиданная ошибка: {e}")
-        return []
-    finally:
-        if conn:
-            conn.close()
-            logger.info("🔌 Соединение с базой данных закрыто.")
 
 @router.callback_query(lambda c: c.data == "who")
 async def find_command(callback: CallbackQuery, state: FSMContext):
@@ -75,10 +94,10 @@ async def find_command(callback: CallbackQuery, state: FSMContext):
     return
 
 
-@router.message(WhoState.WAITING_FOR_USER_INPUT)
+@router.message(WhoState.WAITING_FOR_USER_INPUT, flags={"cost": 2})
 async def handle_user_input(message: Message, state: FSMContext):
     """Обрабатывает ввод email и возвращает список баз данных пользователя."""
-    logger.info(f"📩 Получен email: {message.text}")
+    logger.info("📩 Получен email: {}", message.text)
     if message.text:
         user_input = message.text.strip()
     else:
@@ -91,20 +110,54 @@ async def handle_user_input(message: Message, state: FSMContext):
         return
 
     try:
-        bases = get_user_bases(user_input)
+        bases, has_next = await get_user_bases(user_input)
 
         if bases:
-            response = "📚 Базы данных, к которым у пользователя есть доступ:\n"
-            for base in bases:
-                response += f"{base['title']} (ID: {base['id']})\n"
-            await message.answer(response)
+            text, keyboard = _render_bases(bases, has_prev=False, has_next=has_next)
+            await message.answer(text, reply_markup=keyboard)
+            if has_next:
+                # Оставляем курсоры страницы, чтобы листать кнопками
+                await state.set_state(WhoState.BROWSING)
+                await state.set_data({
+                    "who_email": user_input,
+                    "who_first": _cursor(bases[0]),
+                    "who_last": _cursor(bases[-1]),
+                })
+                return
         else:
             await message.answer("⚠ У пользователя нет доступа к базам данных или он не найден.")
 
     except Exception as e:
-        logger.error(f"🔥 Ошибка при получении баз данных: {e}")
+        logger.error("🔥 Ошибка при получении баз данных: {}", e)
         await message.answer("Произошла ошибка. Попробуйте позже.")
 
     await state.clear()
     if message.from_user:
-        logger.info(f"✅ Состояние FSM очищено для пользователя {message.from_user.id}.")
+        logger.info("✅ Состояние FSM очищено для пользователя {}.", message.from_user.id)
+
+
+@router.callback_query(WhoState.BROWSING, lambda c: c.data in ("who_next", "who_prev"), flags={"cost": 2})
+async def handle_page(callback: CallbackQuery, state: FSMContext):
+    """Листает список баз пользователя, редактируя исходное сообщение."""
+    data = await state.get_data()
+    email = data.get("who_email")
+    if not email or not isinstance(callback.message, Message):
+        await callback.answer("Список устарел, запросите его заново.", show_alert=True)
+        return
+
+    forward = callback.data == "who_next"
+    if forward:
+        bases, has_next = await get_user_bases(email, after=data.get("who_last"))
+        has_prev = True
+    else:
+        bases, has_prev = await get_user_bases(email, before=data.get("who_first"))
+        has_next = True
+
+    if not bases:
+        await callback.answer("Больше баз нет.")
+        return
+
+    text, keyboard = _render_bases(bases, has_prev=has_prev, has_next=has_next)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await state.update_data(who_first=_cursor(bases[0]), who_last=_cursor(bases[-1]))
+    await callback.answer()
@@ -0,0 +1,51 @@
+# bot/middlewares/auth.py
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.enums import ChatType
+from aiogram.types import TelegramObject, Update, User
+
+from bot.services.admins import AdminRegistry
+from bot.services.metrics import UPDATES_REJECTED
+from logger_config import logger
+
+DENIED_TEXT = "У вас нет доступа"
+
+
+class AdminAuthMiddleware(BaseMiddleware):
+    """
+    Отсекает апдейты не от администраторов (outer-middleware на dp.update).
+
+    Регистрируется раньше FSM-middleware, поэтому для чужих апдейтов не
+    читается хранилище состояний и не вызывается ни один хендлер. Отказ
+    отправляется только в личных чатах, остальные апдейты отбрасываются молча.
+    """
+
+    def __init__(self, registry: AdminRegistry):
+        self.registry = registry
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get("event_from_user")
+        if user is not None and user.id in self.registry:
+            return await handler(event, data)
+
+        event_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        UPDATES_REJECTED.labels(event_type).inc()
+        # Отказы в доступе важны для безопасности: пишем каждый, без выборки
+        logger.info("⛔ Апдейт {} от {} отклонен: нет прав", event_type, user.id if user else None)
+        if isinstance(event, Update):
+            # Отвечаем только в личке: в группах и спамерам бот молчит
+            message = event.message
+            outbox = data.get("outbox")
+            if message and message.chat.type == ChatType.PRIVATE and outbox:
+                outbox.send(data["bot"], message.chat.id, DENIED_TEXT)
+            elif message and message.chat.type == ChatType.PRIVATE:
+                await message.answer(DENIED_TEXT)
+            elif event.callback_query:
+                await event.callback_query.answer(DENIED_TEXT, show_alert=True)
+        return None
@@ -0,0 +1,53 @@
+# bot/middlewares/metrics.py
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Router
+from aiogram.types import TelegramObject, Update
+
+from bot.services.metrics import HANDLER_LATENCY, UPDATES_IN_FLIGHT, UPDATES_TOTAL
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Считает входящие апдейты и апдейты в обработке (outer-middleware на dp.update)."""
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            UPDATES_TOTAL.labels(event.event_type).inc()
+        UPDATES_IN_FLIGHT.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATES_IN_FLIGHT.dec()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Замеряет время хендлеров роутера с разбивкой по состоянию FSM."""
+
+    def __init__(self, router_name: str):
+        self.router_name = router_name
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        state = data.get("raw_state") or "none"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            HANDLER_LATENCY.labels(self.router_name, state).observe(time.perf_counter() - started)
+
+
+def setup_handler_metrics(router: Router) -> None:
+    """Подключает замер времени к сообщениям и callback-ам роутера."""
+    middleware = HandlerMetricsMiddleware(router.name)
+    router.message.middleware(middleware)
+    router.callback_query.middleware(middleware)
@@ -0,0 +1,82 @@
+# bot/middlewares/outbound.py
+import asyncio
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    EditMessageCaption,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    Response,
+    SendDocument,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+
+from bot.services.metrics import OUTBOUND_DELAYS, OUTBOUND_DROPPED
+from bot.services.outbox import RateLimiter
+from logger_config import logger
+
+# Методы, на которые действуют лимиты Telegram на сообщения в чат
+CHAT_SEND_METHODS = (
+    SendMessage,
+    SendDocument,
+    SendPhoto,
+    SendMediaGroup,
+    CopyMessage,
+    ForwardMessage,
+    EditMessageText,
+    EditMessageCaption,
+    EditMessageReplyMarkup,
+)
+
+
+class OutboundRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Ограничивает исходящие вызовы Bot API (middleware сессии бота).
+
+    Отправки в чат (CHAT_SEND_METHODS с chat_id) проходят через лимит чата и
+    глобальный лимит; служебные вызовы (getUpdates, getFile, answerCallbackQuery
+    и т.п.) не ограничиваются. Ответ 429 останавливает отправки в этот чат на
+    retry_after, после чего вызов повторяется.
+    """
+
+    def __init__(self, limiter: RateLimiter, max_retries: int):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        limited = chat_id is not None and isinstance(method, CHAT_SEND_METHODS)
+        attempt = 0
+        while True:
+            if limited:
+                await self.limiter.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    OUTBOUND_DROPPED.labels("retry_after").inc()
+                    raise
+                OUTBOUND_DELAYS.labels("retry_after").inc()
+                logger.warning(
+                    "🚦 {} в чат {}: Telegram просит подождать {} с (попытка {})",
+                    type(method).__name__, chat_id, e.retry_after, attempt,
+                )
+                if limited:
+                    # Повтор встанет в очередь чата после паузы
+                    self.limiter.pause(chat_id, e.retry_after)
+                else:
+                    await asyncio.sleep(e.retry_after)
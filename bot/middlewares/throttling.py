@@ -0,0 +1,55 @@
+# bot/middlewares/throttling.py
+import math
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.services.metrics import UPDATES_THROTTLED
+from bot.services.throttling import Throttler
+from logger_config import sampled_logger
+
+# Стоимость хендлера без флага cost
+DEFAULT_COST = 1
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничивает частоту обращений к хендлерам (inner-middleware на dp.message и dp.callback_query).
+
+    Стоимость задается флагом хендлера: `@router.message(..., flags={"cost": 5})`.
+    Сверх лимита хендлер не вызывается, пользователь сразу получает ответ.
+    """
+
+    def __init__(self, throttler: Throttler):
+        self.throttler = throttler
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        cost = get_flag(data, "cost", default=DEFAULT_COST)
+        scope = self.throttler.acquire(user.id, cost)
+        if scope is None:
+            return await handler(event, data)
+
+        UPDATES_THROTTLED.labels(scope).inc()
+        wait = math.ceil(self.throttler.retry_after(user.id, cost, scope))
+        sampled_logger.warning("🚦 Пользователь {} превысил лимит ({}), стоимость {}", user.id, scope, cost)
+        text = f"⏳ Слишком много запросов. Попробуйте через {wait} с."
+        outbox = data.get("outbox")
+        if isinstance(event, Message) and outbox:
+            # Не ждем отправки: подряд идущие отказы уйдут одним сообщением
+            outbox.send(data["bot"], event.chat.id, text)
+        elif isinstance(event, Message):
+            await event.answer(text)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        return None
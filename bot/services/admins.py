@@ -0,0 +1,78 @@
+# bot/services/admins.py
+from __future__ import annotations
+
+import asyncio
+from typing import FrozenSet, Iterable, Optional
+
+import asyncpg
+
+import config
+from bot.services.db import QUERY_ERRORS, fetch, get_connection
+from logger_config import logger
+
+# Реестр администраторов в той же базе, что и мета-таблицы NocoDB:
+#   CREATE TABLE bot_admins (telegram_id bigint PRIMARY KEY, comment text);
+ADMINS_QUERY = "SELECT telegram_id FROM bot_admins"
+
+
+class AdminRegistry:
+    """
+    Множество Telegram ID администраторов: ADMIN_IDS из конфигурации плюс
+    таблица bot_admins.
+
+    Проверка — поиск во frozenset в памяти; таблица перечитывается фоновой
+    задачей раз в `ttl` секунд, так что изменения применяются без передеплоя.
+    При ошибке БД остается последний успешно загруженный набор.
+    """
+
+    def __init__(self, static_ids: Iterable[int], ttl: float):
+        self.static_ids = frozenset(static_ids)
+        self.ttl = ttl
+        self._ids: FrozenSet[int] = self.static_ids
+        self._task: Optional["asyncio.Task[None]"] = None
+        # Предупреждение об отсутствии bot_admins пишется один раз, дальше повторяем молча
+        self._table_missing = False
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._ids
+
+    async def refresh(self) -> None:
+        try:
+            async with get_connection() as conn:
+                rows = await fetch(conn, "bot_admins", ADMINS_QUERY)
+        except asyncpg.UndefinedTableError:
+            if not self._table_missing:
+                logger.warning("Таблица bot_admins не найдена, администраторы только из ADMIN_IDS")
+                self._table_missing = True
+            return
+        except QUERY_ERRORS as e:
+            logger.error("Не удалось обновить список администраторов: {}", e)
+            return
+        if self._table_missing:
+            logger.info("Таблица bot_admins появилась")
+            self._table_missing = False
+        ids = self.static_ids.union(row["telegram_id"] for row in rows)
+        if ids != self._ids:
+            logger.info("Список администраторов обновлен: {} шт.", len(ids))
+        self._ids = ids
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl)
+            await self.refresh()
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._task = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+admin_registry = AdminRegistry(config.ADMIN_IDS, ttl=config.ADMIN_REFRESH_INTERVAL)
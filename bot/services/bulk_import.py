@@ -0,0 +1,112 @@
+# bot/services/bulk_import.py
+from __future__ import annotations
+
+import csv
+import io
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from logger_config import logger
+
+# Строка файла: (номер строки, email, ID или название базы)
+GrantRow = Tuple[int, str, str]
+
+HEADER_EMAIL = {"email", "e-mail", "почта"}
+DELIMITERS = (",", ";", "\t")
+
+
+class BulkImportError(ValueError):
+    """Файл невозможно разобрать как список пар email,база."""
+
+
+def _detect_encoding(sample: bytes) -> str:
+    """Excel под Windows часто сохраняет CSV в cp1251, а не в UTF-8."""
+    try:
+        sample.decode("utf-8-sig")
+        return "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # Обрезанный на границе выборки многобайтовый символ — это все еще UTF-8
+        if e.start >= len(sample) - 3:
+            return "utf-8-sig"
+        return "cp1251"
+
+
+def _detect_delimiter(sample: str) -> str:
+    """Разделитель — самый частый из ',', ';' и табуляции в первой непустой строке."""
+    first_line = next((line for line in sample.splitlines() if line.strip()), "")
+    return max(DELIMITERS, key=first_line.count)
+
+
+def _normalize(line_no: int, row: Tuple) -> Optional[GrantRow]:
+    """Приводит строку к (номер, email, база); пустые строки и заголовок пропускаются."""
+    cells = [str(cell).strip() if cell is not None else "" for cell in row[:2]]
+    cells += [""] * (2 - len(cells))
+    if not any(cells):
+        return None
+    email, base = cells
+    if line_no == 1 and email.lower() in HEADER_EMAIL:
+        return None
+    return line_no, email, base
+
+
+def _iter_csv(stream: BinaryIO) -> Iterator[GrantRow]:
+    sample = stream.read(64 * 1024)
+    stream.seek(0)
+    encoding = _detect_encoding(sample)
+    delimiter = _detect_delimiter(sample.decode(encoding, errors="ignore"))
+
+    text = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    for line_no, row in enumerate(csv.reader(text, delimiter=delimiter), start=1):
+        grant = _normalize(line_no, tuple(row))
+        if grant:
+            yield grant
+
+
+def _iter_xlsx(stream: BinaryIO) -> Iterator[GrantRow]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise BulkImportError("Поддержка XLSX недоступна: не установлен пакет openpyxl") from e
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise BulkImportError(f"Не удалось открыть XLSX: {e}") from e
+    try:
+        sheet = workbook.worksheets[0]
+        for line_no, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            grant = _normalize(line_no, row)
+            if grant:
+                yield grant
+    finally:
+        workbook.close()
+
+
+def iter_grant_rows(stream: BinaryIO, filename: str) -> Iterator[GrantRow]:
+    """
+    Потоково читает пары email,база из CSV или XLSX.
+
+    Первый столбец — e-mail, второй — ID или название базы. Строка заголовка
+    (email,...) и пустые строки пропускаются.
+    """
+    name = filename.lower()
+    logger.info("Разбор файла массовой выдачи: {}", filename)
+    if name.endswith(".xlsx"):
+        return _iter_xlsx(stream)
+    if name.endswith((".csv", ".txt")):
+        return _iter_csv(stream)
+    raise BulkImportError("Поддерживаются только файлы .csv и .xlsx")
+
+
+def read_grant_rows(stream: BinaryIO, filename: str, max_rows: int) -> List[GrantRow]:
+    """
+    Читает все строки файла, но не больше `max_rows`.
+
+    Разбор синхронный (csv/openpyxl), поэтому вызывается через
+    asyncio.to_thread, чтобы не блокировать event loop.
+    """
+    grants: List[GrantRow] = []
+    for grant in iter_grant_rows(stream, filename):
+        grants.append(grant)
+        if len(grants) > max_rows:
+            raise BulkImportError(f"В файле больше {max_rows} строк")
+    return grants
@@ -0,0 +1,185 @@
+# bot/services/cache.py
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from logger_config import logger
+
+# Признак отсутствия значения в кэше (None — допустимое закэшированное значение)
+MISSING: Any = object()
+
+
+class TTLCache:
+    """
+    In-process LRU-кэш с временем жизни записей.
+
+    Каждая запись хранит собственный срок годности, поэтому отрицательные
+    результаты можно кэшировать на меньшее время, чем положительные.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """Возвращает значение или MISSING, если записи нет или она устарела."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return MISSING
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return MISSING
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение; при переполнении вытесняет самую старую запись."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий, промахов и вытеснений."""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class StaleWhileRevalidateCache:
+    """
+    LRU-кэш загружаемых значений с отдачей устаревших данных.
+
+    Запись свежая `ttl` секунд; еще `stale_ttl` секунд она отдается сразу,
+    а загрузчик в фоне обновляет её. Одновременные промахи по одному ключу
+    ждут одну загрузку. Память ограничена суммарным весом записей
+    (например, числом строк в списках), при превышении вытесняются давние.
+    Результат None (ошибка загрузки) не кэшируется.
+    """
+
+    def __init__(
+            self,
+            max_weight: int,
+            ttl: float,
+            stale_ttl: float,
+            weigh: Callable[[Any], int] = lambda value: 1,
+    ):
+        self.max_weight = max_weight
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.weigh = weigh
+        # ключ -> (свежо до, годно до, вес, значение)
+        self._data: "OrderedDict[Hashable, Tuple[float, float, int, Any]]" = OrderedDict()
+        self._weight = 0
+        # Текущая загрузка по ключу; загрузка, начатая до invalidate, отсюда убирается
+        self._loading: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+        item = self._data.get(key)
+        if item is not None and item[1] > now:
+            self._data.move_to_end(key)
+            if item[0] <= now:
+                self.stale_hits += 1
+                self._load(key, load)
+            else:
+                self.hits += 1
+            return item[3]
+
+        self.misses += 1
+        return await asyncio.shield(self._load(key, load))
+
+    def _load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> "asyncio.Future[Any]":
+        future = self._loading.get(key)
+        if future is None:
+            future = self._loading[key] = asyncio.ensure_future(self._fetch(key, load))
+            future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future: "asyncio.Future[Any]") -> None:
+        # Ошибку фонового обновления никто не ждет: логируем, чтобы она не потерялась
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning("Не удалось обновить запись кэша: {}", future.exception())
+
+    async def _fetch(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await load()
+        finally:
+            # После invalidate ключ может занимать уже новая загрузка — её не трогаем
+            current = self._loading.get(key) is task
+            if current:
+                del self._loading[key]
+        if value is not None and current:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._drop(key)
+        weight = self.weigh(value)
+        if weight > self.max_weight:
+            return
+        now = time.monotonic()
+        self._data[key] = (now + self.ttl, now + self.ttl + self.stale_ttl, weight, value)
+        self._weight += weight
+        while self._weight > self.max_weight:
+            _, (_, _, evicted, _) = self._data.popitem(last=False)
+            self._weight -= evicted
+            self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._weight -= item[2]
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удаляет запись. Идущая загрузка отвязывается от ключа: её результат не
+        сохранится, а следующий get() начнет новую загрузку, а не дождется старой.
+        """
+        self._drop(key)
+        self._loading.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "weight": self._weight,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
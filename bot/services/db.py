@@ -0,0 +1,202 @@
+# bot/services/db.py
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set
+
+import asyncpg
+
+import config
+from bot.services.metrics import observe_query, track_pool
+from logger_config import logger, sampled_logger
+
+_pool: Optional[asyncpg.Pool] = None
+
+# Ошибки, после которых соединение из пула считается «мёртвым»
+CONNECTION_ERRORS = (
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    ConnectionError,
+)
+
+# Ошибки выполнения запроса, которые обрабатываются как «нет результата»
+QUERY_ERRORS = (asyncpg.PostgresError, asyncio.TimeoutError, OSError) + CONNECTION_ERRORS
+
+
+async def _check_connection(conn: asyncpg.Connection) -> None:
+    """Проверяет соединение перед выдачей из пула."""
+    await conn.execute("SELECT 1")
+
+
+async def init_pool() -> asyncpg.Pool:
+    """Создает общий пул соединений. Вызывается при старте Dispatcher."""
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    _pool = await asyncpg.create_pool(
+        database=config.DB_NAME,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        host=config.DB_HOST,
+        port=int(config.DB_PORT) if config.DB_PORT else None,
+        min_size=config.DB_POOL_MIN_SIZE,
+        max_size=config.DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=config.DB_POOL_MAX_IDLE,
+        command_timeout=config.DB_COMMAND_TIMEOUT,
+        setup=_check_connection,
+    )
+    track_pool(_pool)
+    logger.info(
+        f"Пул соединений с базой данных создан "
+        f"(min={config.DB_POOL_MIN_SIZE}, max={config.DB_POOL_MAX_SIZE})"
+    )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Закрывает пул соединений. Вызывается при остановке Dispatcher."""
+    global _pool
+    if _pool is None:
+        return
+    await _pool.close()
+    _pool = None
+    logger.info("Пул соединений с базой данных закрыт.")
+
+
+def get_pool() -> asyncpg.Pool:
+    """Возвращает инициализированный пул соединений."""
+    if _pool is None:
+        raise RuntimeError("Пул соединений не инициализирован: вызовите init_pool()")
+    return _pool
+
+
+@asynccontextmanager
+async def get_connection() -> AsyncIterator[asyncpg.Connection]:
+    """Выдает проверенное соединение из пула и возвращает его обратно."""
+    pool = get_pool()
+    try:
+        conn = await pool.acquire(timeout=config.DB_POOL_ACQUIRE_TIMEOUT)
+    except CONNECTION_ERRORS as e:
+        # Проверка на выдаче отбраковала соединение, пробуем еще раз со свежим
+        logger.warning("Соединение из пула не прошло проверку, повторяем: {}", e)
+        conn = await pool.acquire(timeout=config.DB_POOL_ACQUIRE_TIMEOUT)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+# Планы медленных запросов снимаются не чаще раза в DB_EXPLAIN_INTERVAL для каждого имени
+_last_explain: Dict[str, float] = {}
+_explain_tasks: Set["asyncio.Task[None]"] = set()
+
+# EXPLAIN применим только к DML/SELECT; COPY и DDL пропускаем
+EXPLAINABLE_PREFIXES = ("select", "with", "insert", "update", "delete")
+
+
+async def _explain(name: str, query: str, args: Sequence[Any]) -> None:
+    """Снимает EXPLAIN (ANALYZE, BUFFERS) в отдельной транзакции и откатывает её."""
+    try:
+        async with get_connection() as conn:
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                # ANALYZE реально выполняет запрос: ограничиваем ожидание блокировок и время
+                await conn.execute(f"SET LOCAL lock_timeout = {int(config.DB_EXPLAIN_LOCK_TIMEOUT_MS)}")
+                await conn.execute(f"SET LOCAL statement_timeout = {int(config.DB_EXPLAIN_STATEMENT_TIMEOUT_MS)}")
+                rows = await conn.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {query}", *args)
+            finally:
+                await transaction.rollback()
+    except QUERY_ERRORS as e:
+        logger.warning("Не удалось получить план медленного запроса {}: {}", name, e)
+        return
+    plan = "\n".join(row[0] for row in rows)
+    logger.warning("🐢 План медленного запроса {}:\n{}", name, plan)
+
+
+def _schedule_explain(name: str, query: str, args: Sequence[Any]) -> None:
+    if not config.DB_EXPLAIN_ENABLED or not query.lstrip().lower().startswith(EXPLAINABLE_PREFIXES):
+        return
+    now = time.monotonic()
+    if now - _last_explain.get(name, float("-inf")) < config.DB_EXPLAIN_INTERVAL:
+        return
+    _last_explain[name] = now
+    # Не задерживаем хендлер: план снимается в фоне на другом соединении
+    task = asyncio.ensure_future(_explain(name, query, args))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+async def _run(
+        conn: asyncpg.Connection, name: str, method: str, query: str, args: Sequence[Any], explain: bool = True
+) -> Any:
+    """Единый путь выполнения запросов: метрики, журнал медленных запросов и EXPLAIN."""
+    started = time.perf_counter()
+    with observe_query(name):
+        result = await getattr(conn, method)(query, *args)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= config.DB_SLOW_QUERY_MS:
+        logger.warning("🐢 Медленный запрос {}: {:.1f} мс: {}", name, elapsed_ms, ' '.join(query.split()))
+        if explain:
+            _schedule_explain(name, query, args)
+    else:
+        sampled_logger.debug("Запрос {} выполнен за {:.1f} мс", name, elapsed_ms)
+    return result
+
+
+async def fetch(conn: asyncpg.Connection, name: str, query: str, *args: Any) -> List[asyncpg.Record]:
+    """Выполняет именованный запрос и возвращает все строки."""
+    return await _run(conn, name, "fetch", query, args)
+
+
+async def fetchrow(conn: asyncpg.Connection, name: str, query: str, *args: Any) -> Optional[asyncpg.Record]:
+    """Выполняет именованный запрос и возвращает первую строку."""
+    return await _run(conn, name, "fetchrow", query, args)
+
+
+async def fetchval(conn: asyncpg.Connection, name: str, query: str, *args: Any) -> Any:
+    """Выполняет именованный запрос и возвращает первое значение первой строки."""
+    return await _run(conn, name, "fetchval", query, args)
+
+
+async def execute(conn: asyncpg.Connection, name: str, query: str, *args: Any, explain: bool = True) -> str:
+    """
+    Выполняет именованный запрос без результата.
+
+    explain=False отключает EXPLAIN ANALYZE для медленного запроса: нужен для
+    запросов с побочными эффектами, которые нельзя повторять (advisory-блокировки).
+    """
+    return await _run(conn, name, "execute", query, args, explain)
+
+
+async def copy_records(
+        conn: asyncpg.Connection, name: str, table: str, records: Iterable[Sequence], columns: List[str]
+) -> str:
+    """Загружает строки в таблицу через COPY (без EXPLAIN)."""
+    started = time.perf_counter()
+    with observe_query(name):
+        result = await conn.copy_records_to_table(table, records=records, columns=columns)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= config.DB_SLOW_QUERY_MS:
+        logger.warning("🐢 Медленный запрос {}: {:.1f} мс", name, elapsed_ms)
+    return result
+
+
+async def fetch_records(name: str, query: str, *args: Any) -> List[Dict]:
+    """Выполняет SQL-запрос и возвращает результат в виде списка словарей."""
+    try:
+        async with get_connection() as conn:
+            rows = await fetch(conn, name, query, *args)
+    except QUERY_ERRORS as e:
+        logger.error("Ошибка выполнения запроса {}: {}", name, e)
+        return []
+    return [dict(row) for row in rows]
+
+
+async def fetch_record(name: str, query: str, *args: Any) -> Optional[Dict]:
+    """Выполняет SQL-запрос и возвращает первую строку или None."""
+    records = await fetch_records(name, query, *args)
+    return records[0] if records else None
@@ -1,7 +1,13 @@
 from __future__ import annotations
-import psycopg2
+from typing import Dict, List, Optional
+
+import asyncpg
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+import config
 from logger_config import logger
-from bot.handlers.find_user import get_connection
+from bot.services.cache import MISSING, TTLCache
+from bot.services.db import QUERY_ERRORS, execute, fetch, fetchval, get_connection
 
 
 def extract_project_id(user_input: str) -> str:
@@ -16,39 +22,133 @@ def extract_project_id(user_input: str) -> str:
         return user_input  # Если это не URL, возвращаем как есть
 
 
-def get_base_id_by_all(base_input: str) -> str | None:
+# Одна выборка вместо двух: совпадение по ID приоритетнее совпадения по названию
+RESOLVE_BASE_QUERY = """
+SELECT id FROM nc_bases_v2
+WHERE id = $1 OR title = $1
+ORDER BY (id = $1) DESC
+LIMIT 1
+"""
+
+# ID и названия баз меняются редко, поэтому результаты поиска кэшируются в процессе
+base_cache = TTLCache(maxsize=config.BASE_CACHE_SIZE, ttl=config.BASE_CACHE_TTL)
+
+
+async def get_base_id_by_all(base_input: str) -> str | None:
     try:
         # Если это URL, вынимаем ID
         base_id_or_title = extract_project_id(base_input)
-        logger.info(f"Обрабатываем ввод: '{base_input}' -> Извлечено: '{base_id_or_title}'")
-
-        conn = get_connection()
-        if not conn:
-            logger.error("Ошибка подключения к базе данных")
-            return None
-
-        try:
-            with conn.cursor() as cursor:
-                # 1. Сначала пытаемся найти базу как ID
-                cursor.execute("SELECT id FROM nc_bases_v2 WHERE id = %s", (base_id_or_title,))
-                row = cursor.fetchone()
-                if row:
-                    logger.info(f"База найдена по ID: {row[0]}")
-                    return row[0]
-
-                # 2. Если не нашли по ID, ищем по названию
-                cursor.execute("SELECT id FROM nc_bases_v2 WHERE title = %s", (base_id_or_title,))
-                row = cursor.fetchone()
-                if row:
-                    logger.info(f"База найдена по названию: {row[0]}")
-                    return row[0]
-
-                # 3. Ничего не нашли
-                logger.warning(f"База не найдена ни по ID, ни по названию: '{base_id_or_title}'")
-                return None
-        finally:
-            conn.close()
-            logger.info("Соединение с базой данных закрыто.")
     except ValueError as e:
-        logger.error(f"Ошибка при обработке ввода: {e}")
+        logger.error("Ошибка при обработке ввода: {}", e)
+        return None
+    logger.info("Обрабатываем ввод: '{}' -> Извлечено: '{}'", base_input, base_id_or_title)
+
+    cached = base_cache.get(base_id_or_title)
+    if cached is not MISSING:
+        logger.info("База '{}' взята из кэша: {}", base_id_or_title, cached)
+        return cached
+
+    try:
+        async with get_connection() as conn:
+            base_id = await fetchval(conn, "resolve_base", RESOLVE_BASE_QUERY, base_id_or_title)
+    except QUERY_ERRORS as e:
+        # Ошибки не кэшируем, чтобы следующий запрос сходил в базу
+        logger.error("Ошибка при поиске базы: {}", e)
         return None
+
+    if base_id:
+        logger.info("База найдена: {}", base_id)
+        base_cache.set(base_id_or_title, base_id)
+    else:
+        # Отрицательный результат кэшируем ненадолго: базу могут вот-вот создать
+        logger.warning("База не найдена ни по ID, ни по названию: '{}'", base_id_or_title)
+        base_cache.set(base_id_or_title, None, ttl=config.BASE_CACHE_NEGATIVE_TTL)
+    return base_id
+
+
+# Нечеткий поиск по названию через pg_trgm: `%` и `<%` используют GIN-индекс
+# на title, поэтому запрос остается быстрым и на десятках тысяч баз
+SEARCH_BASES_QUERY = """
+SELECT id, title, GREATEST(similarity(title, $1), word_similarity($1, title)) AS score
+FROM nc_bases_v2
+WHERE title % $1 OR $1 <% title
+ORDER BY score DESC, title
+LIMIT $2
+"""
+
+# Без pg_trgm — поиск подстроки (последовательное чтение таблицы)
+SEARCH_BASES_FALLBACK_QUERY = """
+SELECT id, title, 0::real AS score
+FROM nc_bases_v2
+WHERE title ILIKE '%' || $1 || '%'
+ORDER BY length(title), title
+LIMIT $2
+"""
+
+SEARCH_INDEX_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS nc_bases_v2_title_trgm_index "
+    "ON nc_bases_v2 USING gin (title gin_trgm_ops)",
+)
+
+# Лимит callback_data в Telegram — 64 байта
+MAX_CALLBACK_DATA = 64
+
+_trigram_available = True
+
+
+async def ensure_search_index() -> None:
+    """Создает pg_trgm и GIN-индекс по названию баз, если их нет (нужны права на схему)."""
+    try:
+        async with get_connection() as conn:
+            for statement in SEARCH_INDEX_DDL:
+                await execute(conn, "search_index_ddl", statement)
+        logger.info("Индекс нечеткого поиска баз готов")
+    except QUERY_ERRORS as e:
+        logger.warning("Не удалось создать индекс нечеткого поиска баз: {}", e)
+
+
+async def search_bases(text: str, limit: int = config.BASE_SEARCH_LIMIT) -> List[Dict]:
+    """
+    Ищет базы с похожим названием, лучшие совпадения первыми.
+
+    :return: строки (id, title, score); пустой список при ошибке.
+    """
+    global _trigram_available
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        async with get_connection() as conn:
+            if _trigram_available:
+                try:
+                    rows = await fetch(conn, "search_bases", SEARCH_BASES_QUERY, text, limit)
+                    return [dict(row) for row in rows]
+                except asyncpg.UndefinedFunctionError:
+                    _trigram_available = False
+                    logger.warning("Расширение pg_trgm не установлено: поиск баз по подстроке")
+            rows = await fetch(conn, "search_bases_fallback", SEARCH_BASES_FALLBACK_QUERY, text, limit)
+            return [dict(row) for row in rows]
+    except QUERY_ERRORS as e:
+        logger.error("Ошибка при поиске похожих баз: {}", e)
+        return []
+
+
+def base_choice_keyboard(bases: List[Dict], prefix: str) -> InlineKeyboardMarkup:
+    """Кнопка на каждую найденную базу; в callback_data передается её ID."""
+    rows = [
+        [InlineKeyboardButton(text=base["title"] or base["id"], callback_data=f"{prefix}:{base['id']}")]
+        for base in bases
+        if len(f"{prefix}:{base['id']}".encode()) <= MAX_CALLBACK_DATA
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def chosen_base_title(markup: Optional[InlineKeyboardMarkup], callback_data: str, default: str) -> str:
+    """Название базы с нажатой кнопки (без повторного запроса в БД)."""
+    if markup:
+        for row in markup.inline_keyboard:
+            for button in row:
+                if button.callback_data == callback_data:
+                    return button.text
+    return default
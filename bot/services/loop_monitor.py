@@ -0,0 +1,110 @@
+# bot/services/loop_monitor.py
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Optional
+
+from bot.services.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG, EVENT_LOOP_LAG_QUANTILES
+from logger_config import logger
+
+# Файлы бота, по которым в стеке ищется «виновный» хендлер
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LoopMonitor:
+    """
+    Следит за задержкой event loop.
+
+    Корутина-зонд каждые `interval` секунд засыпает и измеряет, насколько позже
+    её разбудили. Сторожевой поток замечает, что зонд давно не отмечался,
+    и логирует стек потока event loop — это и есть блокирующий вызов.
+    """
+
+    def __init__(self, interval: float, block_threshold: float, window: int):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._lags: Deque[float] = deque(maxlen=window)
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def quantile(self, q: float) -> float:
+        """Перцентиль задержки за скользящее окно."""
+        if not self._lags:
+            return 0.0
+        ordered = sorted(self._lags)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        for q in QUANTILES:
+            EVENT_LOOP_LAG_QUANTILES.labels(str(q)).set_function(functools.partial(self.quantile, q))
+        logger.info(
+            "Мониторинг event loop запущен (интервал {} с, порог блокировки {} с)",
+            self.interval, self.block_threshold,
+        )
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self._lags.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        check_every = max(self.block_threshold / 4, 0.01)
+        while not self._stop.wait(check_every):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            # О каждой блокировке сообщаем один раз
+            if stalled >= self.block_threshold and self._reported_heartbeat != heartbeat:
+                self._reported_heartbeat = heartbeat
+                self._report(stalled)
+
+    def _report(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        culprit = next(
+            (
+                entry for entry in reversed(stack)
+                if entry.filename.startswith(BOT_DIR) and entry.filename != __file__
+            ),
+            stack[-1] if stack else None,
+        )
+        EVENT_LOOP_BLOCKS.inc()
+        where = f"{culprit.name} ({culprit.filename}:{culprit.lineno})" if culprit else "неизвестно"
+        logger.warning(
+            "⏳ Event loop заблокирован уже {:.0f} мс в {}\n{}",
+            stalled * 1000, where, "".join(traceback.format_list(stack)),
+        )
@@ -0,0 +1,155 @@
+# bot/services/metrics.py
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from logger_config import logger
+
+# Бакеты под Telegram-бота: от единиц миллисекунд до десятков секунд
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds",
+    "Время обработки апдейта хендлером",
+    ["router", "state"],
+    buckets=LATENCY_BUCKETS,
+)
+UPDATES_TOTAL = Counter(
+    "bot_updates_total",
+    "Полученные апдейты (rate() дает апдейты в секунду)",
+    ["type"],
+)
+UPDATES_IN_FLIGHT = Gauge(
+    "bot_updates_in_flight",
+    "Апдейты, обрабатываемые в данный момент",
+)
+UPDATES_REJECTED = Counter(
+    "bot_updates_rejected_total",
+    "Апдейты от пользователей без прав администратора",
+    ["type"],
+)
+UPDATES_THROTTLED = Counter(
+    "bot_updates_throttled_total",
+    "Апдейты, отклоненные по лимиту частоты",
+    ["scope"],
+)
+FSM_SESSIONS = Gauge(
+    "bot_fsm_sessions",
+    "Диалоги FSM, находящиеся в каком-либо состоянии",
+)
+CACHE_STATS = Gauge(
+    "bot_cache_stats",
+    "Размер in-process кэша и накопленные попадания, промахи и вытеснения",
+    ["cache", "stat"],
+)
+FSM_EVICTIONS = Counter(
+    "bot_fsm_evictions_total",
+    "Диалоги FSM, удаленные из памяти по TTL или при переполнении",
+    ["reason"],
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "bot_db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    ["query"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter(
+    "bot_db_query_errors_total",
+    "Ошибки выполнения SQL-запросов",
+    ["query"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "bot_db_pool_connections",
+    "Соединения пула БД по состоянию",
+    ["state"],
+)
+
+NOCODB_REQUEST_LATENCY = Histogram(
+    "bot_nocodb_request_duration_seconds",
+    "Время запроса к NocoDB API",
+    ["status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+OUTBOUND_DELAYS = Counter(
+    "bot_outbound_delays_total",
+    "Исходящие вызовы Bot API, задержанные лимитом или ответом 429",
+    ["reason"],
+)
+OUTBOUND_DROPPED = Counter(
+    "bot_outbound_dropped_total",
+    "Исходящие сообщения, которые не были отправлены",
+    ["reason"],
+)
+OUTBOUND_COALESCED = Counter(
+    "bot_outbound_coalesced_total",
+    "Тексты, склеенные с предыдущим сообщением в тот же чат",
+)
+
+PROJECT_USERS_LATENCY = Histogram(
+    "bot_project_users_duration_seconds",
+    "Время получения списка пользователей магазина по источнику",
+    ["source"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "bot_event_loop_lag_seconds",
+    "Задержка планирования event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+EVENT_LOOP_LAG_QUANTILES = Gauge(
+    "bot_event_loop_lag_quantile_seconds",
+    "Перцентили задержки event loop за скользящее окно",
+    ["quantile"],
+)
+EVENT_LOOP_BLOCKS = Counter(
+    "bot_event_loop_blocks_total",
+    "Случаи блокировки event loop дольше порога",
+)
+
+
+@contextmanager
+def observe_query(name: str) -> Iterator[None]:
+    """Замеряет время SQL-запроса и считает ошибки по его имени."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DB_QUERY_ERRORS.labels(name).inc()
+        raise
+    finally:
+        DB_QUERY_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+
+def track_pool(pool) -> None:
+    """Публикует заполненность пула asyncpg (размер, свободные и занятые соединения)."""
+    DB_POOL_CONNECTIONS.labels("size").set_function(pool.get_size)
+    DB_POOL_CONNECTIONS.labels("idle").set_function(pool.get_idle_size)
+    DB_POOL_CONNECTIONS.labels("in_use").set_function(lambda: pool.get_size() - pool.get_idle_size())
+    DB_POOL_CONNECTIONS.labels("max").set_function(pool.get_max_size)
+
+
+def track_fsm_sessions(count: Callable[[], int]) -> None:
+    """Публикует число активных диалогов FSM, если хранилище умеет их считать."""
+    FSM_SESSIONS.set_function(count)
+
+
+def track_cache(name: str, cache) -> None:
+    """Публикует счетчики кэша из его stats(); значения только читаются."""
+    def read(stat: str) -> Callable[[], float]:
+        return lambda: cache.stats()[stat]
+
+    for stat in cache.stats():
+        CACHE_STATS.labels(name, stat).set_function(read(stat))
+
+
+def start_metrics_server(host: str, port: int) -> None:
+    """Поднимает HTTP-эндпоинт /metrics в отдельном потоке."""
+    start_http_server(port, addr=host)
+    logger.info("📈 Метрики доступны на http://{}:{}/metrics", host, port)
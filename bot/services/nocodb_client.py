@@ -1,9 +1,13 @@
 # bot/services/nocodb_client.py
-import httpx
-
-from logger_config import logger
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+import httpx
 
+import config
+from bot.services.metrics import NOCODB_REQUEST_LATENCY
+from logger_config import logger, sampled_logger
 
 
 class NocodbClient:
@@ -11,6 +15,9 @@ class NocodbClient:
         """
         Инициализация клиента NocoDB.
 
+        Клиент держит один долгоживущий пул соединений: создается при старте
+        бота и закрывается через close() при остановке.
+
         :param base_url: Базовый URL вашего NocoDB (например, "http://localhost:8080").
         :param api_token: API-токен для аутентификации.
         """
@@ -18,24 +25,103 @@ class NocodbClient:
         self.api_token = api_token
         self.headers = {
             "xc-token": self.api_token,
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate",
         }
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Общий httpx-клиент; создается лениво при первом обращении."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=config.NOCODB_HTTP2,
+                timeout=httpx.Timeout(
+                    config.NOCODB_READ_TIMEOUT,
+                    connect=config.NOCODB_CONNECT_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=config.NOCODB_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.NOCODB_MAX_KEEPALIVE,
+                    keepalive_expiry=config.NOCODB_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Закрывает пул соединений клиента."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("HTTP-клиент NocoDB закрыт.")
+        self._client = None
+
+    async def _get_users_page(self, project_id: str, limit: int, offset: int) -> Dict[str, Any]:
+        """Одна страница пользователей проекта: {"list": [...], "pageInfo": {...}}."""
+        url = f"/api/v1/db/meta/projects/{project_id}/users"
+        status = "error"
+        started = time.perf_counter()
+        try:
+            sampled_logger.info("Отправка запроса к URL: {}{} (offset {})", self.base_url, url, offset)
+            response = await self.client.get(url, params={"limit": limit, "offset": offset})
+            status = str(response.status_code)
+            response.raise_for_status()  # Проверяем, что запрос успешен
+            data = response.json()
+            logger.opt(lazy=True).debug("Тело ответа NocoDB: {}", lambda: data)
+            return data.get("users", {}) if isinstance(data, dict) else {}
+        finally:
+            NOCODB_REQUEST_LATENCY.labels(status).observe(time.perf_counter() - started)
+
+    async def iter_project_users(
+            self, project_id: str, page_size: int = config.NOCODB_PAGE_SIZE
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Отдает пользователей проекта постранично, по порядку.
+
+        Первая страница сообщает общее число строк, остальные запрашиваются
+        параллельно (не более NOCODB_PAGE_CONCURRENCY одновременно), так что
+        вызывающий может обрабатывать первые страницы, пока грузятся следующие.
+        Ошибки HTTP пробрасываются как httpx.HTTPStatusError.
+        """
+        first = await self._get_users_page(project_id, page_size, 0)
+        rows = first.get("list", [])
+        yield rows
+
+        total = first.get("pageInfo", {}).get("totalRows")
+        # Старый API без пагинации отдает весь список сразу
+        if total is None or not rows or len(rows) >= total or len(rows) > page_size:
+            return
+        # NocoDB урезает limit до своего максимума: шагаем по фактическому размеру страницы
+        step = len(rows)
+
+        semaphore = asyncio.Semaphore(config.NOCODB_PAGE_CONCURRENCY)
+
+        async def fetch_page(offset: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return (await self._get_users_page(project_id, step, offset)).get("list", [])
+
+        tasks = [asyncio.ensure_future(fetch_page(offset)) for offset in range(step, total, step)]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def get_project_users(self, project_id: str):
         """
         Получает список пользователей, у которых есть доступ к проекту.
 
         :param project_id: ID проекта.
-        :return: Список пользователей или None в случае ошибки.
+        :return: {"users": {"list": [...], "pageInfo": {"totalRows": N}}} или None в случае ошибки.
         """
-        url = f"{self.base_url}/api/v1/db/meta/projects/{project_id}/users"
+        users: List[Dict[str, Any]] = []
         try:
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Отправка запроса к URL: {url}")
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()  # Проверяем, что запрос успешен
-                logger.info(f"Ответ от NocoDB: {response.json()}")
-                return response.json()  # Возвращаем JSON-ответ
+            async for page in self.iter_project_users(project_id):
+                users.extend(page)
         except httpx.HTTPStatusError as e:
-            logger.error(f"Ошибка при запросе к NocoDB: {e}")
-            return None
\ No newline at end of file
+            logger.error("Ошибка при запросе к NocoDB: {}", e)
+            return None
+        logger.info("Ответ от NocoDB по проекту {}: {} пользователей", project_id, len(users))
+        return {"users": {"list": users, "pageInfo": {"totalRows": len(users)}}}
@@ -0,0 +1,134 @@
+# bot/services/outbox.py
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Hashable, Optional, Tuple
+
+from bot.services.metrics import OUTBOUND_COALESCED, OUTBOUND_DELAYS, OUTBOUND_DROPPED
+from bot.services.throttling import TokenBucket
+from logger_config import logger
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+# Предел длины сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+class RateLimiter:
+    """
+    Очередь на отправку по ведрам токенов: глобальному и по чату.
+
+    Вызов резервирует токен заранее (ведро уходит в минус) и спит до его
+    появления, поэтому конкурентные отправки выстраиваются в очередь, а не
+    проверяют лимит одновременно. `pause` останавливает отправки в один чат
+    на время retry_after из ответа 429, остальные чаты не ждут.
+    """
+
+    def __init__(self, chat_rate: float, chat_burst: float, global_rate: float, global_burst: float):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[Hashable, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def pause(self, chat_id: Hashable, seconds: float) -> None:
+        # Долг в ведре чата: следующий токен появится не раньше чем через `seconds`
+        bucket = self._chat_bucket(chat_id)
+        bucket.refill(time.monotonic())
+        bucket.tokens = min(bucket.tokens, 1 - seconds * bucket.rate)
+
+    def _reserve(self, bucket: TokenBucket, now: float) -> float:
+        bucket.refill(now)
+        bucket.tokens -= 1
+        return bucket.wait_time(0)
+
+    async def acquire(self, chat_id: Optional[Hashable]) -> float:
+        """Ждет своей очереди на отправку; возвращает время ожидания в секундах."""
+        now = time.monotonic()
+        delay = self._reserve(self.global_bucket, now)
+        if chat_id is not None:
+            delay = max(delay, self._reserve(self._chat_bucket(chat_id), now))
+            if len(self._chats) > 1000:
+                self._forget_full(now)
+        if delay > 0:
+            OUTBOUND_DELAYS.labels("rate_limit").inc()
+            await asyncio.sleep(delay)
+        return delay
+
+    def _forget_full(self, now: float) -> None:
+        for chat_id, bucket in list(self._chats.items()):
+            bucket.refill(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._chats[chat_id]
+
+
+class Outbox:
+    """
+    Отправка текстов без ожидания хендлером.
+
+    Тексты копятся в очереди чата и отправляются одним сообщением: идущие
+    подряд тексты склеиваются, пока влезают в лимит длины, а повторы
+    предыдущего текста подряд отбрасываются. Если в очереди чата больше
+    `max_pending` текстов, самые старые отбрасываются.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._queues: Dict[Tuple[int, int], Deque[str]] = {}
+        self._workers: Dict[Tuple[int, int], "asyncio.Task[None]"] = {}
+
+    def send(self, bot: "Bot", chat_id: int, text: str) -> None:
+        key = (bot.id, chat_id)
+        queue = self._queues.setdefault(key, deque())
+        queue.append(text)
+        if len(queue) > self.max_pending:
+            queue.popleft()
+            OUTBOUND_DROPPED.labels("queue_full").inc()
+        if key not in self._workers:
+            self._workers[key] = asyncio.ensure_future(self._drain(bot, key))
+
+    @staticmethod
+    def _coalesce(queue: Deque[str]) -> str:
+        text = last = queue.popleft()
+        while queue:
+            if queue[0] == last:
+                queue.popleft()
+                OUTBOUND_DROPPED.labels("duplicate").inc()
+            elif len(text) + 2 + len(queue[0]) <= MAX_MESSAGE_LENGTH:
+                last = queue.popleft()
+                text = f"{text}\n\n{last}"
+                OUTBOUND_COALESCED.inc()
+            else:
+                break
+        return text
+
+    async def _drain(self, bot: "Bot", key: Tuple[int, int]) -> None:
+        queue = self._queues[key]
+        try:
+            while queue:
+                text = self._coalesce(queue)
+                try:
+                    await bot.send_message(key[1], text)
+                except Exception as e:
+                    OUTBOUND_DROPPED.labels("error").inc()
+                    logger.error("Не удалось отправить сообщение в чат {}: {}", key[1], e)
+        finally:
+            del self._workers[key]
+            del self._queues[key]
+
+    async def close(self, timeout: float = 5) -> None:
+        """Дожидается отправки накопленного, оставшееся отбрасывает."""
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        _, pending = await asyncio.wait(workers, timeout=timeout)
+        for task in pending:
+            task.cancel()
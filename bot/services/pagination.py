@@ -0,0 +1,75 @@
+# bot/services/pagination.py
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.services.cache import MISSING, TTLCache
+from bot.services.outbox import MAX_MESSAGE_LENGTH
+
+# Запас под строку «Страница N из M»
+FOOTER_RESERVE = 40
+
+
+def build_pages(header: str, lines: Sequence[str], per_page: int) -> List[str]:
+    """
+    Разбивает строки на страницы не длиннее лимита Telegram.
+
+    Страница заканчивается на `per_page` строках или раньше, если следующая
+    строка не влезает в сообщение; слишком длинная строка обрезается.
+    """
+    budget = MAX_MESSAGE_LENGTH - len(header) - FOOTER_RESERVE
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    for line in lines:
+        line = line if len(line) < budget else line[:budget - 2] + "…"
+        if current and (len(current) >= per_page or length + len(line) + 1 > budget):
+            chunks.append(current)
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current or not chunks:
+        chunks.append(current)
+
+    total = len(chunks)
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        parts = [header, *chunk]
+        if total > 1:
+            parts.append(f"\nСтраница {number} из {total}")
+        pages.append("\n".join(parts))
+    return pages
+
+
+def page_keyboard(prefix: str, page: int, total: int) -> Optional[InlineKeyboardMarkup]:
+    """Кнопки «Назад»/«Далее»; номер целевой страницы передается в callback_data."""
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="⬅ Назад", callback_data=f"{prefix}:{page - 1}"))
+    if page < total - 1:
+        buttons.append(InlineKeyboardButton(text="Далее ➡", callback_data=f"{prefix}:{page + 1}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+
+
+class PageStore:
+    """
+    Готовые страницы последнего списка каждого чата.
+
+    На чат хранится один кортеж (id сообщения, страницы): новый список
+    заменяет предыдущий, старые чаты вытесняются по TTL и LRU.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def save(self, chat_id: int, message_id: int, pages: Sequence[str]) -> None:
+        self._cache.set(chat_id, (message_id, tuple(pages)))
+
+    def get(self, chat_id: int, message_id: int) -> Optional[Tuple[str, ...]]:
+        """Страницы списка из сообщения `message_id` или None, если он устарел."""
+        item = self._cache.get(chat_id)
+        if item is MISSING or item[0] != message_id:
+            return None
+        return item[1]
@@ -0,0 +1,113 @@
+# bot/services/project_users.py
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import config
+from bot.services.cache import StaleWhileRevalidateCache
+from bot.services.db import QUERY_ERRORS, fetch, fetchval, get_connection
+from bot.services.metrics import PROJECT_USERS_LATENCY
+from bot.services.nocodb_client import NocodbClient
+from logger_config import logger
+
+# Пользователи магазина одним JOIN по индексу nc_base_users_v2(base_id).
+# LEFT JOIN от nc_bases_v2: нет строк — нет магазина, одна строка с NULL — нет пользователей
+PROJECT_USERS_QUERY = """
+SELECT u.email, bu.roles
+FROM nc_bases_v2 AS b
+LEFT JOIN (
+    nc_base_users_v2 AS bu
+    JOIN nc_users_v2 AS u ON u.id = bu.fk_user_id
+) ON bu.base_id = b.id
+WHERE b.id = $1
+ORDER BY u.email
+"""
+
+# Колонки мета-схемы NocoDB, на которые опирается PROJECT_USERS_QUERY
+# DISTINCT: таблицы могут повторяться в нескольких схемах из search_path
+SCHEMA_CHECK_QUERY = """
+SELECT count(DISTINCT (table_name, column_name)) = 6
+FROM information_schema.columns
+WHERE table_schema = ANY(current_schemas(false))
+  AND (table_name, column_name) IN (
+      ('nc_bases_v2', 'id'),
+      ('nc_base_users_v2', 'base_id'), ('nc_base_users_v2', 'fk_user_id'),
+      ('nc_base_users_v2', 'roles'), ('nc_users_v2', 'id'), ('nc_users_v2', 'email')
+  )
+"""
+
+# Результат проверки схемы: None — еще не проверяли
+_schema_supported: Optional[bool] = None
+
+# Списки пользователей популярных магазинов запрашиваются часто: свежий отдается
+# из кэша, слегка устаревший — тоже, но с обновлением в фоне
+project_users_cache = StaleWhileRevalidateCache(
+    max_weight=config.PROJECT_USERS_CACHE_MAX_ROWS,
+    ttl=config.PROJECT_USERS_CACHE_TTL,
+    stale_ttl=config.PROJECT_USERS_CACHE_STALE_TTL,
+    weigh=lambda data: len(data["users"]["list"]) + 1,
+)
+
+
+async def _sql_supported() -> bool:
+    global _schema_supported
+    if _schema_supported is None:
+        async with get_connection() as conn:
+            _schema_supported = bool(await fetchval(conn, "project_users_schema", SCHEMA_CHECK_QUERY))
+        if not _schema_supported:
+            logger.warning("Схема мета-таблиц NocoDB не распознана: пользователи магазинов берутся через API")
+    return _schema_supported
+
+
+async def _fetch_sql(project_id: str) -> Optional[Dict[str, Any]]:
+    """Как и API, возвращает None для неизвестного магазина (None не кэшируется)."""
+    async with get_connection() as conn:
+        rows = await fetch(conn, "project_users", PROJECT_USERS_QUERY, project_id)
+    if not rows:
+        logger.warning("Магазин {} не найден в nc_bases_v2", project_id)
+        return None
+    users = [dict(row) for row in rows if row["email"] is not None]
+    return {"users": {"list": users, "pageInfo": {"totalRows": len(users)}}}
+
+
+async def load_project_users(nocodb: NocodbClient, project_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Пользователи проекта в формате NocodbClient.get_project_users.
+
+    Читает мета-таблицы напрямую, если схема знакома (PROJECT_USERS_SOURCE=auto)
+    или это задано явно (sql); при ошибке БД или незнакомой схеме — через API NocoDB.
+    """
+    global _schema_supported
+    source = config.PROJECT_USERS_SOURCE
+    if source != "api":
+        started = time.perf_counter()
+        try:
+            if source == "sql" or await _sql_supported():
+                users = await _fetch_sql(project_id)
+                elapsed = time.perf_counter() - started
+                PROJECT_USERS_LATENCY.labels("sql").observe(elapsed)
+                logger.info("Пользователи проекта {} из БД за {:.1f} мс", project_id, elapsed * 1000)
+                return users
+        except QUERY_ERRORS as e:
+            # Например, после обновления NocoDB: перепроверим схему при следующем запросе
+            _schema_supported = None
+            logger.error("Не удалось получить пользователей проекта {} из БД, используем API: {}", project_id, e)
+
+    started = time.perf_counter()
+    users = await nocodb.get_project_users(project_id)
+    elapsed = time.perf_counter() - started
+    PROJECT_USERS_LATENCY.labels("api").observe(elapsed)
+    logger.info("Пользователи проекта {} из API NocoDB за {:.1f} мс", project_id, elapsed * 1000)
+    return users
+
+
+async def get_project_users(nocodb: NocodbClient, project_id: str) -> Optional[Dict[str, Any]]:
+    """Пользователи проекта через кэш."""
+    return await project_users_cache.get(project_id, lambda: load_project_users(nocodb, project_id))
+
+
+def invalidate_project_users(base_ids: Iterable[str]) -> None:
+    """Сбрасывает кэш магазинов, в которых бот только что выдал или отозвал доступ."""
+    for base_id in set(base_ids):
+        project_users_cache.invalidate(base_id)
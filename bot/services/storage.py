@@ -0,0 +1,187 @@
+# bot/services/storage.py
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+
+import config
+from bot.services.metrics import FSM_EVICTIONS
+from logger_config import logger
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+
+class _Session:
+    """Диалог в памяти: интернированное имя состояния и данные кортежем пар."""
+
+    __slots__ = ("state", "data", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.state: Optional[str] = None
+        self.data: Tuple[Tuple[str, Any], ...] = ()
+        self.expires_at = expires_at
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    MemoryStorage с ограничением памяти.
+
+    Каждое обращение продлевает диалог на `ttl` секунд; брошенный диалог
+    истекает вместе с данными (base_id, email_input), а не подхватывается
+    через несколько дней. Диалоги лежат в OrderedDict в порядке последнего
+    обращения: при одинаковом TTL это и порядок истечения, поэтому просроченные
+    снимаются с головы, а при превышении `maxsize` вытесняется самый давний.
+    Пустые диалоги (без состояния и данных) не хранятся вовсе.
+
+    Словарь меняется только из event loop. Число диалогов в состоянии ведется
+    счетчиком там же, чтобы метрики из потока Prometheus его только читали.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._sessions: "OrderedDict[Hashable, _Session]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+        self._live = 0
+
+    @staticmethod
+    def _key(key: StorageKey) -> Hashable:
+        # Кортеж вместо dataclass StorageKey; бот один, поэтому bot_id не нужен
+        return key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+
+    def _purge_expired(self, now: float) -> None:
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[key]
+            self._forget(session)
+            self.expirations += 1
+            FSM_EVICTIONS.labels("ttl").inc()
+
+    def _get(self, key: StorageKey) -> Optional[_Session]:
+        now = time.monotonic()
+        self._purge_expired(now)
+        session = self._sessions.get(self._key(key))
+        if session is not None:
+            session.expires_at = now + self.ttl
+            self._sessions.move_to_end(self._key(key))
+        return session
+
+    def _get_or_create(self, key: StorageKey) -> _Session:
+        session = self._get(key)
+        if session is not None:
+            return session
+        while len(self._sessions) >= self.maxsize:
+            _, evicted = self._sessions.popitem(last=False)
+            self._forget(evicted)
+            self.evictions += 1
+            FSM_EVICTIONS.labels("lru").inc()
+        session = self._sessions[self._key(key)] = _Session(time.monotonic() + self.ttl)
+        return session
+
+    def _forget(self, session: _Session) -> None:
+        if session.state is not None:
+            self._live -= 1
+
+    def _drop_if_empty(self, key: StorageKey, session: _Session) -> None:
+        if session.state is None and not session.data:
+            self._sessions.pop(self._key(key), None)
+
+    @property
+    def live_sessions(self) -> int:
+        """
+        Диалоги в каком-либо состоянии. Только читает счетчик: вызывается из
+        потока метрик. Просроченные, но еще не снятые диалоги учитываются до
+        ближайшего обращения к хранилищу.
+        """
+        return self._live
+
+    async def close(self) -> None:
+        self._sessions.clear()
+        self._live = 0
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        if state is None and self._sessions.get(self._key(key)) is None:
+            return
+        session = self._get_or_create(key)
+        self._live += (state is not None) - (session.state is not None)
+        session.state = sys.intern(state) if state is not None else None
+        self._drop_if_empty(key, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        session = self._get(key)
+        return session.state if session else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if not data and self._sessions.get(self._key(key)) is None:
+            return
+        session = self._get_or_create(key)
+        session.data = tuple(data.items())
+        self._drop_if_empty(key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        session = self._get(key)
+        return dict(session.data) if session else {}
+
+
+def create_storage(backend: Optional[str] = None, redis: Optional["Redis"] = None) -> BaseStorage:
+    """
+    Создает хранилище состояний FSM по настройке FSM_STORAGE.
+
+    :param backend: "memory" или "redis"; по умолчанию берется из конфигурации.
+    :param redis: готовый клиент Redis (например, fakeredis в тестах);
+        по умолчанию создается из REDIS_URL.
+    """
+    backend = (backend or config.FSM_STORAGE).lower()
+    if backend == "memory":
+        logger.info(
+            "FSM: используется память (ttl={}s, не более {} диалогов)",
+            config.FSM_STATE_TTL, config.FSM_MEMORY_MAX_SESSIONS,
+        )
+        return BoundedMemoryStorage(ttl=config.FSM_STATE_TTL, maxsize=config.FSM_MEMORY_MAX_SESSIONS)
+    if backend != "redis":
+        raise ValueError(f"Неизвестное хранилище FSM: {backend}")
+
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+    if redis is None:
+        from redis.asyncio import Redis
+        redis = Redis.from_url(config.REDIS_URL)
+
+    logger.info("FSM: используется RedisStorage (prefix={}, ttl={}s)", config.FSM_KEY_PREFIX, config.FSM_STATE_TTL)
+    return RedisStorage(
+        redis,
+        key_builder=DefaultKeyBuilder(prefix=config.FSM_KEY_PREFIX, with_destiny=True),
+        state_ttl=config.FSM_STATE_TTL,
+        data_ttl=config.FSM_DATA_TTL,
+    )
+
+
+def fsm_session_counter(storage: BaseStorage) -> Optional[Callable[[], int]]:
+    """Функция подсчета активных диалогов; для Redis не поддерживается (нужен SCAN по всем ключам)."""
+    if isinstance(storage, BoundedMemoryStorage):
+        return lambda: storage.live_sessions
+    if isinstance(storage, MemoryStorage):
+        # Словарь меняет event loop, а считает поток метрик: list() снимает копию
+        # целиком под GIL, без "dictionary changed size during iteration"
+        return lambda: sum(1 for record in list(storage.storage.values()) if record.state)
+    return None
+
+
+def create_events_isolation(storage: BaseStorage) -> BaseEventIsolation:
+    """В Redis апдейты одного чата сериализуются между всеми репликами бота."""
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    if isinstance(storage, RedisStorage):
+        return storage.create_isolation()
+    return DisabledEventIsolation()
@@ -0,0 +1,82 @@
+# bot/services/throttling.py
+from __future__ import annotations
+
+import time
+from typing import Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """
+    Ведро токенов: пополняется со скоростью `rate` в секунду до `capacity`.
+
+    Операция стоит `cost` токенов; пустое ведро означает, что лимит исчерпан.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, cost: float) -> float:
+        """Через сколько секунд в ведре наберется `cost` токенов."""
+        return max(0.0, (cost - self.tokens) / self.rate) if self.rate else float("inf")
+
+
+class Throttler:
+    """
+    Лимит операций на пользователя и на бота целиком.
+
+    Токены списываются из обоих ведер только если хватает в обоих, чтобы
+    отказ по глобальному лимиту не тратил лимит пользователя.
+    """
+
+    def __init__(self, user_rate: float, user_burst: float, global_rate: float, global_burst: float):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def _user_bucket(self, user_id: Hashable, now: float) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        bucket.refill(now)
+        return bucket
+
+    def _forget_full(self) -> None:
+        # Полные ведра ничем не отличаются от новых: не держим их в памяти
+        for user_id in [key for key, bucket in self._buckets.items() if bucket.tokens >= bucket.capacity]:
+            del self._buckets[user_id]
+
+    def acquire(self, user_id: Hashable, cost: float) -> Optional[str]:
+        """
+        Списывает `cost` токенов.
+
+        :return: None при успехе, иначе исчерпанный лимит: "user" или "global".
+        """
+        now = time.monotonic()
+        user = self._user_bucket(user_id, now)
+        self.global_bucket.refill(now)
+        # Операция дороже емкости ведра иначе не выполнилась бы никогда
+        user_cost = min(cost, user.capacity)
+        global_cost = min(cost, self.global_bucket.capacity)
+        if user.tokens < user_cost:
+            return "user"
+        if self.global_bucket.tokens < global_cost:
+            return "global"
+        user.tokens -= user_cost
+        self.global_bucket.tokens -= global_cost
+        if len(self._buckets) > 1000:
+            self._forget_full()
+        return None
+
+    def retry_after(self, user_id: Hashable, cost: float, scope: str) -> float:
+        bucket = self._buckets[user_id] if scope == "user" else self.global_bucket
+        return bucket.wait_time(min(cost, bucket.capacity))
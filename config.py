@@ -9,4 +9,114 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 INVITE_URL = os.getenv("INVITE_URL")
-ADMIN_IDS = list(map(int, os.getenv("ADMIN_IDS", "").split(","))) if os.getenv("ADMIN_IDS") else []
\ No newline at end of file
+ADMIN_IDS = list(map(int, os.getenv("ADMIN_IDS", "").split(","))) if os.getenv("ADMIN_IDS") else []
+# Как часто перечитывать таблицу администраторов bot_admins, секунды
+ADMIN_REFRESH_INTERVAL = float(os.getenv("ADMIN_REFRESH_INTERVAL", "60"))
+
+# Лимит запросов (ведро токенов): пополнение в секунду и емкость на пользователя и на бота
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", "1"))
+THROTTLE_USER_BURST = float(os.getenv("THROTTLE_USER_BURST", "10"))
+THROTTLE_GLOBAL_RATE = float(os.getenv("THROTTLE_GLOBAL_RATE", "20"))
+THROTTLE_GLOBAL_BURST = float(os.getenv("THROTTLE_GLOBAL_BURST", "60"))
+
+# Исходящие сообщения: лимиты Telegram — около 1 сообщения в секунду в чат и 30 в секунду всего
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "25"))
+OUTBOUND_GLOBAL_BURST = float(os.getenv("OUTBOUND_GLOBAL_BURST", "25"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", "20"))
+# Пул соединений с базой данных
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+
+# HTTP-клиент NocoDB
+NOCODB_HTTP2 = os.getenv("NOCODB_HTTP2", "false").lower() in ("1", "true", "yes")
+NOCODB_CONNECT_TIMEOUT = float(os.getenv("NOCODB_CONNECT_TIMEOUT", "5"))
+NOCODB_READ_TIMEOUT = float(os.getenv("NOCODB_READ_TIMEOUT", "15"))
+NOCODB_MAX_CONNECTIONS = int(os.getenv("NOCODB_MAX_CONNECTIONS", "20"))
+NOCODB_MAX_KEEPALIVE = int(os.getenv("NOCODB_MAX_KEEPALIVE", "10"))
+NOCODB_KEEPALIVE_EXPIRY = float(os.getenv("NOCODB_KEEPALIVE_EXPIRY", "30"))
+# Постраничная загрузка пользователей проекта: размер страницы и одновременных запросов
+NOCODB_PAGE_SIZE = int(os.getenv("NOCODB_PAGE_SIZE", "100"))
+NOCODB_PAGE_CONCURRENCY = int(os.getenv("NOCODB_PAGE_CONCURRENCY", "4"))
+
+# Размер страницы списка баз пользователя
+WHO_PAGE_SIZE = int(os.getenv("WHO_PAGE_SIZE", "20"))
+
+# Список пользователей магазина: строк на странице и сколько хранить страницы для листания
+PROJECT_USERS_PAGE_SIZE = int(os.getenv("PROJECT_USERS_PAGE_SIZE", "40"))
+PAGE_STORE_TTL = float(os.getenv("PAGE_STORE_TTL", "3600"))
+PAGE_STORE_MAX_CHATS = int(os.getenv("PAGE_STORE_MAX_CHATS", "1000"))
+
+# Кэш пользователей магазина: сколько список свежий, сколько еще отдается с фоновым
+# обновлением (секунды) и сколько строк всех списков держать в памяти
+PROJECT_USERS_CACHE_TTL = float(os.getenv("PROJECT_USERS_CACHE_TTL", "60"))
+PROJECT_USERS_CACHE_STALE_TTL = float(os.getenv("PROJECT_USERS_CACHE_STALE_TTL", "600"))
+PROJECT_USERS_CACHE_MAX_ROWS = int(os.getenv("PROJECT_USERS_CACHE_MAX_ROWS", "100000"))
+# Источник списка пользователей магазина: auto (SQL, если схема знакома, иначе API), sql или api
+PROJECT_USERS_SOURCE = os.getenv("PROJECT_USERS_SOURCE", "auto").lower()
+
+# Кэш поиска баз по ID или названию
+BASE_CACHE_SIZE = int(os.getenv("BASE_CACHE_SIZE", "1024"))
+BASE_CACHE_TTL = float(os.getenv("BASE_CACHE_TTL", "600"))
+BASE_CACHE_NEGATIVE_TTL = float(os.getenv("BASE_CACHE_NEGATIVE_TTL", "30"))
+# Нечеткий поиск баз: сколько вариантов предлагать и создавать ли pg_trgm-индекс при старте
+BASE_SEARCH_LIMIT = int(os.getenv("BASE_SEARCH_LIMIT", "8"))
+BASE_SEARCH_CREATE_INDEX = os.getenv("BASE_SEARCH_CREATE_INDEX", "false").lower() in ("1", "true", "yes")
+
+# Массовая выдача доступа из файла
+BULK_MAX_FILE_SIZE = int(os.getenv("BULK_MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+
+# Размер порции удаления при отключении пользователя от всех баз
+OFFBOARD_CHUNK_SIZE = int(os.getenv("OFFBOARD_CHUNK_SIZE", "500"))
+
+# Хранилище состояний FSM: memory (по умолчанию) или redis
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+FSM_KEY_PREFIX = os.getenv("FSM_KEY_PREFIX", "secondbot:fsm")
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "3600"))
+FSM_DATA_TTL = int(os.getenv("FSM_DATA_TTL", "3600"))
+# Предел диалогов в памяти: при переполнении вытесняются давно неактивные
+FSM_MEMORY_MAX_SESSIONS = int(os.getenv("FSM_MEMORY_MAX_SESSIONS", "10000"))
+
+# Режим получения апдейтов: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный адрес балансировщика, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Регистрировать ли вебхук в Telegram при старте (достаточно одной реплики)
+WEBHOOK_REGISTER = os.getenv("WEBHOOK_REGISTER", "true").lower() in ("1", "true", "yes")
+
+# Эндпоинт метрик Prometheus (METRICS_PORT=0 отключает)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Журнал медленных запросов и автоматический EXPLAIN
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_EXPLAIN_ENABLED = os.getenv("DB_EXPLAIN_ENABLED", "true").lower() in ("1", "true", "yes")
+DB_EXPLAIN_INTERVAL = float(os.getenv("DB_EXPLAIN_INTERVAL", "300"))
+DB_EXPLAIN_LOCK_TIMEOUT_MS = int(os.getenv("DB_EXPLAIN_LOCK_TIMEOUT_MS", "1000"))
+DB_EXPLAIN_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_EXPLAIN_STATEMENT_TIMEOUT_MS", "10000"))
+
+# Логирование: dev — цветной синхронный вывод, prod — JSON-строки через очередь
+LOG_MODE = os.getenv("LOG_MODE", "dev").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if LOG_MODE == "dev" else "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE")  # Необязательный файл с ротацией, например /var/log/secondbot/app.log
+LOG_ROTATION = os.getenv("LOG_ROTATION", "100 MB")
+LOG_RETENTION = os.getenv("LOG_RETENTION", "10")  # Число файлов или срок, например "14 days"
+LOG_COMPRESSION = os.getenv("LOG_COMPRESSION", "gz")
+# Пишется 1 из N сообщений sampled_logger; выборка только в prod, в dev видно всё
+LOG_SAMPLE_RATE = int(os.getenv("LOG_SAMPLE_RATE", "100")) if LOG_MODE == "prod" else 1
+
+# Мониторинг задержки event loop и блокирующих вызовов
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", "600"))
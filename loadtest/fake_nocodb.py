@@ -0,0 +1,45 @@
+# loadtest/fake_nocodb.py
+from __future__ import annotations
+
+from aiohttp import web
+
+
+def _users(project_id: str, count: int):
+    return [
+        {"id": f"us_{project_id}_{i}", "email": f"user{i}@example.com", "roles": "editor"}
+        for i in range(count)
+    ]
+
+
+async def start_fake_nocodb(host: str = "127.0.0.1", port: int = 0, users_per_project: int = 50) -> web.AppRunner:
+    """
+    Поднимает фейковый NocoDB с эндпоинтом /api/v1/db/meta/projects/{id}/users.
+
+    Поддерживает limit/offset и возвращает pageInfo, как мета-API NocoDB.
+    Фактический адрес: runner.addresses[0].
+    """
+
+    async def project_users(request: web.Request) -> web.Response:
+        users = _users(request.match_info["project_id"], users_per_project)
+        limit = int(request.query.get("limit", len(users) or 1))
+        offset = int(request.query.get("offset", 0))
+        page = users[offset:offset + limit]
+        return web.json_response({
+            "users": {
+                "list": page,
+                "pageInfo": {
+                    "totalRows": len(users),
+                    "page": offset // limit + 1,
+                    "pageSize": limit,
+                    "isFirstPage": offset == 0,
+                    "isLastPage": offset + limit >= len(users),
+                },
+            }
+        })
+
+    app = web.Application()
+    app.router.add_get("/api/v1/db/meta/projects/{project_id}/users", project_users)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,60 @@
+# loadtest/fake_session.py
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, SendMessage, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+
+class FakeSession(BaseSession):
+    """
+    Офлайн-замена Telegram Bot API для aiogram.
+
+    Отвечает на sendMessage и editMessageText сообщением, на остальные методы
+    (answerCallbackQuery, setWebhook, ...) — True. Ответ проходит через
+    обычный check_response, поэтому объекты создаются так же, как в бою.
+    """
+
+    def __init__(self, latency: float = 0.0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    def _result(self, method: TelegramMethod[Any]) -> Any:
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return {
+                "message_id": method.message_id if isinstance(method, EditMessageText) and method.message_id
+                else next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "private"},
+                "text": method.text,
+            }
+        return True
+
+    async def make_request(
+            self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        self.calls[method.__api_method__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        content = json.dumps({"ok": True, "result": self._result(method)}, default=str)
+        response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+        return response.result  # type: ignore[return-value]
+
+    async def stream_content(
+            self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+            chunk_size: int = 65536, raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,244 @@
+# loadtest/run.py
+"""
+Нагрузочный прогон Dispatcher бота без Telegram.
+
+Синтетические апдейты сценариев start/find/who/add/delete подаются в
+dp.feed_update с заданной частотой от множества администраторов. Bot API
+заменен FakeSession, NocoDB — локальным фейковым сервером, база — локальный
+Postgres из DB_* (с --seed в ней создаются и заполняются мета-таблицы NocoDB).
+
+    python -m loadtest --seed --rate 50 --duration 30 --admins 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+FLOWS = ("start", "find", "who", "add", "delete")
+ADMIN_ID_BASE = 900_000_000
+FAKE_TOKEN = "42:LOADTESTloadtestLOADTESTloadtest000"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест Dispatcher бота")
+    parser.add_argument("--rate", type=float, default=20, help="Целевая частота запуска сценариев, шт/с")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность подачи нагрузки, с")
+    parser.add_argument("--admins", type=int, default=20, help="Число имитируемых администраторов")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="Сценарии через запятую")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Задержка фейкового Bot API, с")
+    parser.add_argument("--nocodb-users", type=int, default=50, help="Пользователей в ответе фейкового NocoDB")
+    parser.add_argument("--seed", action="store_true", help="Создать мета-таблицы и заполнить их")
+    parser.add_argument("--reset", action="store_true", help="Очистить таблицы перед заполнением")
+    parser.add_argument("--users", type=int, default=1000, help="Пользователей при заполнении")
+    parser.add_argument("--bases", type=int, default=200, help="Баз при заполнении")
+    parser.add_argument("--memberships", type=int, default=10000, help="Доступов при заполнении")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчет в JSON")
+    return parser.parse_args(argv)
+
+
+def _prepare_env(args: argparse.Namespace, nocodb_url: str) -> None:
+    """Конфигурация бота читается из окружения при импорте, поэтому задаем его заранее."""
+    os.environ.setdefault("API_TOKEN", FAKE_TOKEN)
+    os.environ["NOCODB_BASE_URL"] = nocodb_url
+    os.environ.setdefault("NOCODB_API_TOKEN", "loadtest")
+    os.environ["ADMIN_IDS"] = ",".join(str(ADMIN_ID_BASE + i) for i in range(args.admins))
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("FSM_STORAGE", "memory")
+    # Меряем сам бот, а не лимитер: задайте THROTTLE_* явно, чтобы проверить и его
+    os.environ.setdefault("THROTTLE_USER_RATE", "1000")
+    os.environ.setdefault("THROTTLE_GLOBAL_RATE", "100000")
+    os.environ.setdefault("THROTTLE_GLOBAL_BURST", "100000")
+
+
+class UpdateFactory:
+    """Собирает апдейты Telegram так, как их прислал бы Bot API."""
+
+    def __init__(self, bot: Any):
+        self.bot = bot
+        self._ids = itertools.count(1)
+
+    def _user(self, admin_id: int) -> Dict[str, Any]:
+        return {"id": admin_id, "is_bot": False, "first_name": "Admin"}
+
+    def _message(self, admin_id: int, text: str) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._ids),
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": admin_id, "type": "private"},
+            "from": self._user(admin_id),
+            "text": text,
+        }
+
+    def message(self, admin_id: int, text: str):
+        from aiogram.types import Update
+        return Update.model_validate(
+            {"update_id": next(self._ids), "message": self._message(admin_id, text)},
+            context={"bot": self.bot},
+        )
+
+    def callback(self, admin_id: int, data: str):
+        from aiogram.types import Update
+        message = self._message(admin_id, "Добро пожаловать в Админ-панель!")
+        message["from"] = {"id": 42, "is_bot": True, "first_name": "Bot"}
+        return Update.model_validate(
+            {
+                "update_id": next(self._ids),
+                "callback_query": {
+                    "id": str(next(self._ids)),
+                    "from": self._user(admin_id),
+                    "chat_instance": "loadtest",
+                    "data": data,
+                    "message": message,
+                },
+            },
+            context={"bot": self.bot},
+        )
+
+
+def flow_steps(flow: str, args: argparse.Namespace) -> List[Tuple[str, str]]:
+    """Шаги сценария: ("callback" | "message", данные)."""
+    from loadtest.schema import base_title, user_email
+
+    email = user_email(random.randint(1, args.users))
+    base = base_title(random.randint(1, args.bases))
+    if flow == "start":
+        return [("callback", "start"), ("message", f"p_{random.randint(1, args.bases)}")]
+    if flow == "find":
+        return [("callback", "find"), ("message", email)]
+    if flow == "who":
+        return [("callback", "who"), ("message", email)]
+    if flow == "add":
+        return [("callback", "add"), ("message", base), ("message", email)]
+    if flow == "delete":
+        return [("callback", "delete"), ("message", email), ("message", base)]
+    raise ValueError(f"Неизвестный сценарий: {flow}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from loadtest.fake_nocodb import start_fake_nocodb
+
+    nocodb = await start_fake_nocodb(users_per_project=args.nocodb_users)
+    host, port = nocodb.addresses[0][:2]
+    _prepare_env(args, f"http://{host}:{port}")
+
+    # Импорт после настройки окружения: бот читает config при импорте
+    from aiogram import Bot
+    from aiogram.client.default import DefaultBotProperties
+    from aiogram.enums import ParseMode
+
+    from bot.app import dp
+    from loadtest.fake_session import FakeSession
+    from loadtest.schema import create_schema, seed
+    from loadtest.stats import summarize
+
+    session = FakeSession(latency=args.api_latency)
+    bot = Bot(token=os.environ["API_TOKEN"], session=session,
+              default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    factory = UpdateFactory(bot)
+
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    try:
+        if args.seed:
+            from bot.services.db import get_connection
+            async with get_connection() as conn:
+                await create_schema(conn)
+                seeded = await seed(conn, args.users, args.bases, args.memberships, reset=args.reset)
+                print("Данные созданы" if seeded else "Данные уже есть, заполнение пропущено")
+
+        flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+        flow_latency: Dict[str, List[float]] = defaultdict(list)
+        step_latency: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        idle_admins: asyncio.Queue = asyncio.Queue()
+        for i in range(args.admins):
+            idle_admins.put_nowait(ADMIN_ID_BASE + i)
+        updates_fed = 0
+        skipped = 0
+        tasks = set()
+
+        async def run_flow(admin_id: int, flow: str) -> None:
+            nonlocal updates_fed
+            started = time.perf_counter()
+            try:
+                for kind, payload in flow_steps(flow, args):
+                    update = (factory.callback if kind == "callback" else factory.message)(admin_id, payload)
+                    step_started = time.perf_counter()
+                    await dp.feed_update(bot, update)
+                    step_latency[flow].append(time.perf_counter() - step_started)
+                    updates_fed += 1
+                flow_latency[flow].append(time.perf_counter() - started)
+            except Exception:
+                errors[flow] += 1
+            finally:
+                idle_admins.put_nowait(admin_id)
+
+        interval = 1 / args.rate
+        load_started = time.perf_counter()
+        next_at = load_started
+        while time.perf_counter() - load_started < args.duration:
+            if idle_admins.empty():
+                # Все администраторы заняты: сценарий не запускается, считаем пропуск
+                skipped += 1
+            else:
+                task = asyncio.ensure_future(run_flow(idle_admins.get_nowait(), random.choice(flows)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - load_started
+    finally:
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await nocodb.cleanup()
+
+    report = {
+        "target_rate": args.rate,
+        "duration_s": elapsed,
+        "admins": args.admins,
+        "updates": updates_fed,
+        "updates_per_s": updates_fed / elapsed if elapsed else 0.0,
+        "flows_skipped": skipped,
+        "api_calls": dict(session.calls),
+        "flows": {
+            flow: {
+                "flow": summarize(flow_latency[flow]),
+                "step": summarize(step_latency[flow]),
+                "errors": errors[flow],
+            }
+            for flow in flows
+        },
+    }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"\nАпдейтов: {report['updates']} за {report['duration_s']:.1f} с "
+        f"({report['updates_per_s']:.1f}/с), пропущено сценариев: {report['flows_skipped']}"
+    )
+    print(f"{'сценарий':<8} {'n':>6} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'шаг p99':>9} {'ошибок':>7}")
+    for flow, data in report["flows"].items():
+        f, s = data["flow"], data["step"]
+        print(
+            f"{flow:<8} {f['count']:>6} {f['p50_ms']:>9.1f} {f['p95_ms']:>9.1f} "
+            f"{f['p99_ms']:>9.1f} {s['p99_ms']:>9.1f} {data['errors']:>7}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,106 @@
+# loadtest/schema.py
+"""
+Минимальное подмножество мета-схемы NocoDB, с которым работает бот,
+и генератор тестовых данных. Только для одноразовых баз: reset=True
+очищает таблицы.
+"""
+from __future__ import annotations
+
+import asyncpg
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nc_users_v2 (
+    id varchar(20) PRIMARY KEY,
+    email varchar(255),
+    password varchar(255),
+    invite_token varchar(255),
+    invite_token_expires varchar(255),
+    roles varchar(255),
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS nc_users_v2_email_index ON nc_users_v2 (email);
+
+CREATE TABLE IF NOT EXISTS nc_bases_v2 (
+    id varchar(128) PRIMARY KEY,
+    title varchar(255),
+    prefix varchar(255),
+    status varchar(255),
+    description text,
+    meta text,
+    deleted boolean DEFAULT false,
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS nc_base_users_v2 (
+    base_id varchar(128),
+    fk_user_id varchar(20),
+    roles text,
+    starred boolean,
+    pinned boolean,
+    "group" varchar(255),
+    color varchar(255),
+    "order" real,
+    hidden real,
+    opened_date timestamptz,
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS nc_base_users_v2_fk_user_id_index ON nc_base_users_v2 (fk_user_id);
+CREATE INDEX IF NOT EXISTS nc_base_users_v2_base_id_index ON nc_base_users_v2 (base_id);
+"""
+
+SEED_USERS = """
+INSERT INTO nc_users_v2 (id, email, roles)
+SELECT 'us_' || g, 'user' || g || '@example.com', 'org-level-viewer'
+FROM generate_series(1, $1) AS g
+"""
+
+SEED_BASES = """
+INSERT INTO nc_bases_v2 (id, title)
+SELECT 'p_' || g, 'Магазин ' || g
+FROM generate_series(1, $1) AS g
+"""
+
+# У каждого пользователя per_user баз подряд со сдвигом: пары (база, пользователь) уникальны
+SEED_MEMBERSHIPS = """
+INSERT INTO nc_base_users_v2 (base_id, fk_user_id, roles)
+SELECT 'p_' || (1 + ((g / $3) * 7 + g % $3) % $2), 'us_' || (1 + g / $3), 'editor'
+FROM generate_series(0, $1 - 1) AS g
+"""
+
+
+def user_email(n: int) -> str:
+    return f"user{n}@example.com"
+
+
+def base_title(n: int) -> str:
+    return f"Магазин {n}"
+
+
+async def create_schema(conn: asyncpg.Connection) -> None:
+    await conn.execute(SCHEMA)
+
+
+async def seed(
+        conn: asyncpg.Connection, users: int, bases: int, memberships: int, reset: bool = False
+) -> bool:
+    """
+    Заполняет таблицы: user1..userN@example.com, «Магазин 1..M», memberships доступов.
+
+    :return: False, если данные уже есть и reset не задан.
+    """
+    if reset:
+        await conn.execute("TRUNCATE nc_base_users_v2, nc_bases_v2, nc_users_v2")
+    elif await conn.fetchval("SELECT EXISTS (SELECT 1 FROM nc_users_v2)"):
+        return False
+
+    per_user = max(1, min(bases, -(-memberships // users)))
+    memberships = min(memberships, users * per_user)
+    async with conn.transaction():
+        await conn.execute(SEED_USERS, users)
+        await conn.execute(SEED_BASES, bases)
+        await conn.execute(SEED_MEMBERSHIPS, memberships, bases, per_user)
+    await conn.execute("ANALYZE nc_users_v2, nc_bases_v2, nc_base_users_v2")
+    return True
@@ -1,13 +1,61 @@
 import sys
+from typing import Dict, Tuple
+
 from loguru import logger
 
+import config
+
 log_format = (
     "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
     "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
 )
 
+# Счетчики сэмплирования по месту вызова (модуль, строка)
+_sample_counters: Dict[Tuple[str, int], int] = {}
+
+
+def _sample(record) -> None:
+    """Решает один раз на сообщение (до всех sink-ов), пропускать ли его: 1 из N."""
+    rate = record["extra"].get("sample") or 1
+    key = (record["name"], record["line"])
+    seen = _sample_counters.get(key, 0)
+    _sample_counters[key] = seen + 1
+    record["extra"]["sampled_out"] = seen % rate != 0
+
+
+def _sampling_filter(record) -> bool:
+    return not record["extra"].get("sampled_out")
+
+
 logger.remove()
-# logger.add("app.log", rotation="500 MB", format=log_format)
-logger.add(sink=sys.stdout, format=log_format, level="DEBUG")
+if config.LOG_MODE == "prod":
+    # enqueue=True: запись, ротация и сжатие идут в отдельном потоке, а не в event loop
+    logger.add(
+        sink=sys.stdout,
+        serialize=True,
+        enqueue=True,
+        level=config.LOG_LEVEL,
+        filter=_sampling_filter,
+        backtrace=False,
+        diagnose=False,
+    )
+    if config.LOG_FILE:
+        logger.add(
+            config.LOG_FILE,
+            serialize=True,
+            enqueue=True,
+            level=config.LOG_LEVEL,
+            filter=_sampling_filter,
+            rotation=config.LOG_ROTATION,
+            retention=int(config.LOG_RETENTION) if config.LOG_RETENTION.isdigit() else config.LOG_RETENTION,
+            compression=config.LOG_COMPRESSION,
+            backtrace=False,
+            diagnose=False,
+        )
+else:
+    logger.add(sink=sys.stdout, format=log_format, level=config.LOG_LEVEL, filter=_sampling_filter)
+
+# Для частых однотипных сообщений на горячих путях
+sampled_logger = logger.bind(sample=config.LOG_SAMPLE_RATE).patch(_sample)
 
-logger.debug("logger init..")
\ No newline at end of file
+logger.debug("logger init..")